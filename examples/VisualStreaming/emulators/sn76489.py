@@ -30,18 +30,29 @@ class SN76489:
     NOISE_TAPS_WHITE = 0x0009  # Bits 0 and 3
     NOISE_TAPS_PERIODIC = 0x0001  # Bit 0 only (periodic noise)
 
+    # Phase increment per output sample for every 10-bit tone divider.
+    # Entry 0 (divider disabled) is 0 so silent channels never advance.
+    _PHASE_INC_TABLE = np.zeros(1024, dtype=np.float64)
+    _PHASE_INC_TABLE[1:] = CLOCK / (32.0 * np.arange(1, 1024, dtype=np.float64)) / SAMPLE_RATE
+
+    # Linear volume for each 4-bit attenuation value.
+    # Each step is approximately 2dB: 10^(-atten * 2 / 20) = 10^(-atten / 10),
+    # and attenuation 15 is silence.
+    _VOLUME_TABLE = np.array([10.0 ** (-atten / 10.0) for atten in range(15)] + [0.0],
+                             dtype=np.float64)
+
     def __init__(self):
         # Tone registers (10-bit frequency dividers)
-        self.tone_regs = [0, 0, 0, 0]
+        self.tone_regs = np.zeros(4, dtype=np.uint16)
 
         # Attenuation registers (4-bit, 0=loudest, 15=silent)
-        self.attenuation = [15, 15, 15, 15]  # Start silent
+        self.attenuation = np.full(4, 15, dtype=np.uint8)  # Start silent
 
         # Noise register
         self.noise_reg = 0  # Bits 0-1: shift rate, Bit 2: 0=periodic, 1=white
 
         # Phase accumulators for waveform generation (0.0 to 1.0)
-        self.phase = [0.0, 0.0, 0.0]
+        self.phase = np.zeros(3, dtype=np.float64)
         self.tone_outputs = [1, 1, 1]  # Current output state (1 or -1)
 
         # Noise state - proper LFSR implementation
@@ -69,24 +80,18 @@ class SN76489:
         else:
             # Use channel 2's frequency (shift_rate_bits == 3)
             if self.tone_regs[2] > 0:
-                return self.CLOCK / (32.0 * self.tone_regs[2])
+                return self.CLOCK / (32.0 * int(self.tone_regs[2]))
             return 0.0
 
     def _shift_lfsr(self):
         """Shift the LFSR and return new output bit."""
-        # Determine tap mask based on noise type
-        is_white = (self.noise_reg & 0x04) != 0
-        taps = self.NOISE_TAPS_WHITE if is_white else self.NOISE_TAPS_PERIODIC
-
         # Calculate feedback bit (XOR of tapped bits, or just bit 0 for periodic)
-        if is_white:
-            # Parity of bits 0 and 3
-            feedback = ((self.noise_lfsr & taps) != 0) and \
-                      (bin(self.noise_lfsr & taps).count('1') & 1)
-            feedback = 1 if (bin(self.noise_lfsr & taps).count('1') & 1) else 0
+        if self.noise_reg & 0x04:
+            # Parity of bits 0 and 3 (single popcount of the tapped bits)
+            feedback = bin(self.noise_lfsr & self.NOISE_TAPS_WHITE).count('1') & 1
         else:
             # Just bit 0 for periodic noise
-            feedback = self.noise_lfsr & 1
+            feedback = self.noise_lfsr & self.NOISE_TAPS_PERIODIC
 
         # Shift right and insert feedback at bit 15
         self.noise_lfsr = ((self.noise_lfsr >> 1) | (feedback << 15)) & 0xFFFF
@@ -135,7 +140,7 @@ class SN76489:
         if channel < 0 or channel >= 3:
             return 0.0
 
-        reg = self.tone_regs[channel]
+        reg = int(self.tone_regs[channel])
         if reg == 0:
             return 0.0
 
@@ -147,13 +152,7 @@ class SN76489:
         if channel < 0 or channel >= self.NUM_CHANNELS:
             return 0.0
 
-        atten = self.attenuation[channel]
-        if atten == 15:
-            return 0.0
-
-        # Each step is approximately 2dB
-        # Volume = 10^(-atten * 2 / 20) = 10^(-atten / 10)
-        return 10.0 ** (-atten / 10.0)
+        return float(self._VOLUME_TABLE[self.attenuation[channel]])
 
     def is_active(self, channel: int) -> bool:
         """Check if a channel is producing sound."""
@@ -166,42 +165,60 @@ class SN76489:
 
         # Tone channels need a valid frequency
         if channel < 3:
-            return self.tone_regs[channel] > 0
+            return bool(self.tone_regs[channel] > 0)
 
         # Noise channel is always "active" if not attenuated
         return True
 
-    def generate_samples(self, num_samples: int) -> Tuple[np.ndarray, ...]:
+    def is_silent(self) -> bool:
+        """Check if every channel is muted (generate_samples would only output zeros)."""
+        atten = self.attenuation
+        if atten[3] < 15:
+            return False
+        for ch in range(3):
+            if atten[ch] < 15 and self.tone_regs[ch] > 0:
+                return False
+        return True
+
+    def generate_samples(self, num_samples: int, out=None) -> Tuple[np.ndarray, ...]:
         """
         Generate waveform samples for all channels.
 
+        Args:
+            num_samples: Number of samples to generate
+            out: Optional destination, 4 float32 arrays (or a (4, num_samples)
+                 array) the samples are written into instead of new arrays
+
         Returns:
             Tuple of 4 numpy arrays (channels 0-3), each with num_samples float32 values
             normalized to [-1.0, 1.0].
         """
-        outputs = []
-
-        # Generate tone channels (vectorized for performance)
-        for ch in range(3):
-            volume = self.get_volume(ch)
-
-            if volume > 0 and self.tone_regs[ch] > 0:
-                freq = self.get_frequency(ch)
-                phase_inc = freq / self.SAMPLE_RATE
-
-                # Vectorized phase calculation
-                t = np.arange(num_samples, dtype=np.float32)
-                phases = (self.phase[ch] + t * phase_inc) % 1.0
-
-                # Square wave: +volume for phase < 0.5, -volume otherwise
-                samples = np.where(phases < 0.5, volume, -volume).astype(np.float32)
-
-                # Update phase for next call
-                self.phase[ch] = (self.phase[ch] + num_samples * phase_inc) % 1.0
-            else:
-                samples = np.zeros(num_samples, dtype=np.float32)
+        # Generate all 3 tone channels in one batch: shape (3, num_samples)
+        regs = self.tone_regs[:3].astype(np.float64)
+        volumes = self._VOLUME_TABLE[self.attenuation[:3]].astype(np.float32)
+        active = (volumes > 0) & (regs > 0)
+
+        # Phase increment per sample (0 for silent/disabled channels)
+        phase_inc = np.where(active, self._PHASE_INC_TABLE[self.tone_regs[:3]], 0.0)
+
+        t = np.arange(num_samples, dtype=np.float32)
+        phases = (self.phase.astype(np.float32)[:, None]
+                  + t[None, :] * phase_inc.astype(np.float32)[:, None]) % 1.0
+
+        # Square wave: +volume for phase < 0.5, -volume otherwise (0 when inactive)
+        amp = np.where(active, volumes, np.float32(0.0))[:, None]
+        if out is None:
+            tones = np.where(phases < 0.5, amp, -amp)
+            outputs = [tones[0], tones[1], tones[2]]
+        else:
+            # Same square wave written in place: amp - 2 * amp where phase >= 0.5
+            outputs = [out[ch][:num_samples] for ch in range(4)]
+            for ch in range(3):
+                np.multiply(phases[ch] >= 0.5, -2.0 * amp[ch], out=outputs[ch])
+                outputs[ch] += amp[ch]
 
-            outputs.append(samples)
+        # Update phase for next call (inactive channels keep their phase)
+        self.phase = np.where(active, (self.phase + num_samples * phase_inc) % 1.0, self.phase)
 
         # Generate noise channel (simplified for performance)
         # Full LFSR emulation is too slow - use cached random for visualization
@@ -243,16 +260,19 @@ class SN76489:
         else:
             noise_samples = np.zeros(num_samples, dtype=np.float32)
 
-        outputs.append(noise_samples)
+        if out is None:
+            outputs.append(noise_samples)
+        else:
+            outputs[3][:] = noise_samples
 
         return tuple(outputs)
 
     def reset(self):
         """Reset the PSG to initial state."""
-        self.tone_regs = [0, 0, 0, 0]
-        self.attenuation = [15, 15, 15, 15]
+        self.tone_regs = np.zeros(4, dtype=np.uint16)
+        self.attenuation = np.full(4, 15, dtype=np.uint8)
         self.noise_reg = 0
-        self.phase = [0.0, 0.0, 0.0]
+        self.phase = np.zeros(3, dtype=np.float64)
         self.tone_outputs = [1, 1, 1]
         self.noise_lfsr = 0x8000  # Reset LFSR
         self.noise_counter = 0.0
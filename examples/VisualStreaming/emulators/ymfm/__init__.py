@@ -26,6 +26,12 @@ class YM2612ymfm:
 
     def __init__(self):
         self._chip = _YM2612()
+        # Register writes are the hottest call; bind them straight to the
+        # extension so each write skips the Python wrapper frame below.
+        self.write = self._chip.write
+        # Whether the extension renders into caller buffers (generate_samples
+        # out=); extensions built before that was added need a copy instead
+        self._native_out = True
 
     def reset(self):
         """Reset the chip to initial state."""
@@ -35,6 +41,9 @@ class YM2612ymfm:
         """
         Write to a YM2612 register.
 
+        Shadowed per-instance by the extension's write() (see __init__);
+        kept for documentation and for subclasses.
+
         Args:
             port: Port number (0 or 1)
             addr: Register address
@@ -42,18 +51,34 @@ class YM2612ymfm:
         """
         self._chip.write(port, addr, data)
 
-    def generate_samples(self, num_samples: int) -> Tuple[np.ndarray, ...]:
+    def generate_samples(self, num_samples: int, out=None) -> Tuple[np.ndarray, ...]:
         """
         Generate audio samples for all channels (per-channel mono for visualization).
         Also captures stereo mix internally - call get_stereo_buffer() to retrieve.
 
         Args:
             num_samples: Number of samples to generate
+            out: Optional destination, 6 contiguous float32 arrays (or a
+                 (6, num_samples) array) the samples are rendered into
 
         Returns:
             Tuple of 6 numpy arrays (one per FM channel), each float32
+            (the rows of out when given)
         """
+        if out is not None and num_samples > 0:
+            if self._native_out:
+                try:
+                    return self._chip.generate_samples(num_samples, out)
+                except TypeError:
+                    self._native_out = False
+            result = self._chip.generate_samples(num_samples)
+            for ch in range(self.NUM_CHANNELS):
+                out[ch][:num_samples] = result[ch]
+            return tuple(out)
+
         if num_samples <= 0:
+            if out is not None:
+                return tuple(out)
             return tuple(np.zeros(0, dtype=np.float32) for _ in range(self.NUM_CHANNELS))
 
         result = self._chip.generate_samples(num_samples)
@@ -109,7 +134,7 @@ if __name__ == "__main__":
         print(f"  Ch{ch}: max={np.abs(arr).max():.4f}, samples={len(arr)}")
 
         # Check for zero crossings (periodic waveform)
-        crossings = np.sum(np.diff(np.sign(arr)) != 0)
+        crossings = np.count_nonzero((arr[:-1] < 0) != (arr[1:] < 0))
         print(f"         zero crossings: {crossings}")
 
     print("\nTest complete!")
@@ -7,6 +7,7 @@
 #include <vector>
 #include <cstring>
 #include <cmath>
+#include <optional>
 
 // ymfm includes
 #include "ymfm_opn.h"
@@ -88,6 +89,9 @@ public:
     static constexpr int SAMPLE_RATE = 44100;
     static constexpr uint32_t CLOCK = 7670453;
     static constexpr double INTERNAL_RATE = CLOCK / 144.0;
+    // Smallest block worth dropping the GIL for: re-acquiring it behind a
+    // busy Python thread can take a whole switch interval (5 ms)
+    static constexpr int GIL_RELEASE_MIN_SAMPLES = 256;
 
     YM2612Wrapper() : m_chip(m_interface) {
         m_chip.reset();
@@ -117,20 +121,53 @@ public:
         m_chip.write(offset + 1, static_cast<uint8_t>(data));
     }
 
-    py::tuple generate_samples(int num_samples) {
-        std::vector<py::array_t<float>> outputs;
-        for (int ch = 0; ch < NUM_CHANNELS; ch++) {
-            outputs.push_back(py::array_t<float>(num_samples));
+    // Render num_samples per channel. With out (a sequence of NUM_CHANNELS
+    // writable contiguous float32 arrays, e.g. rows of a 2D array) the samples
+    // are written straight into it instead of newly allocated arrays.
+    py::tuple generate_samples(int num_samples, py::object out = py::none()) {
+        std::vector<py::array> outputs;
+        if (out.is_none()) {
+            for (int ch = 0; ch < NUM_CHANNELS; ch++) {
+                outputs.push_back(py::array_t<float>(num_samples));
+            }
+        } else {
+            py::sequence rows = out.cast<py::sequence>();
+            if (py::len(rows) != NUM_CHANNELS) {
+                throw py::value_error("out must hold one array per channel");
+            }
+            for (int ch = 0; ch < NUM_CHANNELS; ch++) {
+                py::object row = rows[ch];
+                if (!py::isinstance<py::array_t<float>>(row)) {
+                    throw py::value_error("out rows must be float32 numpy arrays");
+                }
+                py::array arr = py::reinterpret_borrow<py::array>(row);
+                if (arr.ndim() != 1 ||
+                        arr.strides(0) != static_cast<py::ssize_t>(sizeof(float)) ||
+                        !arr.writeable() || arr.shape(0) < num_samples) {
+                    throw py::value_error(
+                        "out rows must be writable, contiguous and num_samples long");
+                }
+                outputs.push_back(arr);
+            }
         }
 
         std::vector<float*> out_ptrs;
         for (int ch = 0; ch < NUM_CHANNELS; ch++) {
-            out_ptrs.push_back(outputs[ch].mutable_data());
+            out_ptrs.push_back(static_cast<float*>(outputs[ch].mutable_data()));
         }
 
         // Also capture stereo output in the same pass (for audio playback)
         m_stereo_buffer.resize(num_samples * 2);
 
+        // The synthesis loop only touches chip state and raw buffers, so let
+        // other Python threads (GUI, serial streaming) run while we render
+        // large blocks. Short waits (0x7n/0x8n) keep the GIL.
+        {
+        std::optional<py::gil_scoped_release> release;
+        if (num_samples >= GIL_RELEASE_MIN_SAMPLES) {
+            release.emplace();
+        }
+
         for (int i = 0; i < num_samples; i++) {
             m_resample_accum += m_resample_ratio;
 
@@ -177,6 +214,7 @@ public:
             m_stereo_buffer[i * 2 + 1] = std::max(-1.0f, std::min(1.0f,
                 m_prev_stereo[1] * (1.0f - frac) + m_curr_stereo[1] * frac));
         }
+        }  // GIL re-acquired here (if released)
 
         py::tuple result(NUM_CHANNELS);
         for (int ch = 0; ch < NUM_CHANNELS; ch++) {
@@ -226,7 +264,8 @@ PYBIND11_MODULE(_ymfm, m) {
         .def(py::init<>())
         .def("reset", &YM2612Wrapper::reset)
         .def("write", &YM2612Wrapper::write)
-        .def("generate_samples", &YM2612Wrapper::generate_samples)
+        .def("generate_samples", &YM2612Wrapper::generate_samples,
+             py::arg("num_samples"), py::arg("out") = py::none())
         .def("get_stereo_buffer", &YM2612Wrapper::get_stereo_buffer)
         .def("is_active", &YM2612Wrapper::is_active)
         .def("is_dac_enabled", &YM2612Wrapper::is_dac_enabled);
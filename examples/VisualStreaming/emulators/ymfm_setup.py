@@ -10,6 +10,21 @@ ymfm_src = os.path.join(this_dir, "ymfm_src", "src")
 # Change to this directory so relative paths work
 os.chdir(this_dir)
 
+# Let the compiler vectorize ymfm's operator/envelope loops.
+# By default the build targets the build machine (-march=native; MSVC has
+# no equivalent, so AVX2). Set YMFM_PORTABLE=1 when building for
+# distribution to target the baseline instruction set of any x86-64 CPU.
+portable = os.environ.get("YMFM_PORTABLE", "") not in ("", "0")
+if os.name == "nt":
+    compile_args = ["/std:c++17", "/O2", "/fp:fast", "/EHsc"]
+    if not portable:
+        compile_args += ["/arch:AVX2"]
+else:
+    compile_args = ["-std=c++17", "-O3", "-ffast-math", "-funroll-loops"]
+    if not portable:
+        # Enables AVX2/FMA only where the build machine has them
+        compile_args += ["-march=native"]
+
 ext = Extension(
     "_ymfm",
     sources=[os.path.join(this_dir, "ymfm_binding.cpp")],
@@ -18,7 +33,7 @@ ext = Extension(
         pybind11.get_include(),
     ],
     language="c++",
-    extra_compile_args=["/std:c++17", "/O2", "/EHsc"] if os.name == "nt" else ["-std=c++17", "-O3"],
+    extra_compile_args=compile_args,
 )
 
 setup(
@@ -22,14 +22,18 @@ import warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
 import argparse
-import glob
+import contextlib
 import gzip
+import math
+import mmap
 import os
 import sys
 import struct
 import time
 import threading
 import queue
+from collections import Counter, deque
+from functools import lru_cache
 
 try:
     import serial
@@ -38,6 +42,22 @@ except ImportError:
     print("ERROR: pyserial not installed. Run: pip install pyserial")
     sys.exit(1)
 
+import numpy as np
+
+# Numba (optional - compiles the VGM preprocessing kernels to native code).
+# Without it the kernels run as plain Python on bytes/bytearray buffers.
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
 # Add local modules to path
 _script_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, _script_dir)
@@ -51,7 +71,7 @@ try:
         from visualizer.app_pygame import VisualizerApp
     else:
         from visualizer.app import VisualizerApp
-    from streaming.command_interceptor import CommandInterceptor
+    from streaming.command_interceptor import AudioRing, CommandInterceptor
     _HAS_VISUALIZATION = True
 except ImportError as e:
     print(f"Note: Visualization unavailable ({e}). Running in CLI mode.")
@@ -117,13 +137,46 @@ BOARD_SETTINGS = {
 CHUNK_HEADER = 0x01
 CHUNK_END = 0x02
 
+# Accepted (lowercased) answers to yes/no prompts
+_YES = frozenset({'y', 'yes'})
+
+# Precompiled little-endian field format for VGM header/offset fields
+_U32_LE = struct.Struct('<I')
+
+# Largest wait a single CMD_WAIT_FRAMES can encode
+_WAIT_MAX_SAMPLES = 65535
+
+# Offline playback sleeps until this close to a deadline, then spins the rest
+# (OS sleep granularity can be ~15ms on Windows)
+_PLAYBACK_SPIN_SECONDS = 0.001
+
+# Wait classification by command byte: _IS_WAIT[cmd] is True for mergeable
+# waits, _FIXED_WAIT[cmd] is their length in samples (CMD_WAIT_FRAMES reads
+# its length from the args instead)
+_IS_WAIT = [False] * 256
+_FIXED_WAIT = [0] * 256
+for _cmd in (CMD_WAIT_NTSC, CMD_WAIT_PAL, CMD_WAIT_FRAMES):
+    _IS_WAIT[_cmd] = True
+_FIXED_WAIT[CMD_WAIT_NTSC] = FRAME_SAMPLES_NTSC
+_FIXED_WAIT[CMD_WAIT_PAL] = FRAME_SAMPLES_PAL
+for _cmd in range(0x70, 0x80):
+    _IS_WAIT[_cmd] = True
+    _FIXED_WAIT[_cmd] = (_cmd & 0x0F) + 1
+del _cmd
+_IS_WAIT_ARR = np.array(_IS_WAIT, dtype=np.bool_)
+_FIXED_WAIT_ARR = np.array(_FIXED_WAIT, dtype=np.int64)
+
+# Pre-built single-byte objects, indexed by value
+_BYTE1 = tuple(bytes((i,)) for i in range(256))
+
 # =============================================================================
 # Utility Functions
 # =============================================================================
 
-def find_arduino_port():
-    """Auto-detect Arduino port."""
-    ports = serial.tools.list_ports.comports()
+def find_arduino_port(ports=None):
+    """Auto-detect Arduino port (optionally from an already-enumerated ports list)."""
+    if ports is None:
+        ports = serial.tools.list_ports.comports()
     for port in ports:
         desc = (port.description or "").lower()
         if any(x in desc for x in ['arduino', 'mega', 'uno', 'ch340', 'ch341', 'ftdi']):
@@ -133,6 +186,87 @@ def find_arduino_port():
     return None
 
 
+# Bumped to force a fresh serial port enumeration (see cached_comports)
+_port_epoch = 0
+
+
+@lru_cache(maxsize=1)
+def _enumerate_ports(epoch):
+    """Enumerate serial ports; cached until the epoch is bumped."""
+    return tuple(serial.tools.list_ports.comports())
+
+
+def cached_comports(rescan=False):
+    """
+    Serial ports, enumerated once and reused across wizard replays.
+
+    rescan=True bumps the epoch so the ports are enumerated again
+    (e.g. nothing was found and the board may have just been plugged in).
+    """
+    global _port_epoch
+    if rescan:
+        _port_epoch += 1
+    return list(_enumerate_ports(_port_epoch))
+
+
+@lru_cache(maxsize=16)
+def _scan_vgm_dir(search_dir, mtime_ns):
+    """
+    Scan one directory for VGM/VGZ files.
+
+    mtime_ns is the directory's modification time; it is only part of the
+    cache key, so adding/removing files invalidates the cached listing.
+    Files rewritten in place don't change it, so sizes aren't cached.
+
+    Returns: tuple of paths
+    """
+    found = []
+    with os.scandir(search_dir) as it:
+        for entry in it:
+            if entry.name.lower().endswith(('.vgm', '.vgz')) and entry.is_file():
+                found.append(os.path.normpath(entry.path))
+    return tuple(found)
+
+
+def _find_vgm(search_dirs):
+    """
+    Find VGM/VGZ files in the given directories with one scan per directory.
+
+    Returns: sorted list of (path, size_in_bytes)
+    """
+    found = {}
+    for search_dir in search_dirs:
+        try:
+            paths = _scan_vgm_dir(search_dir, os.stat(search_dir).st_mtime_ns)
+        except OSError:
+            continue
+        for path in paths:
+            try:
+                found[path] = os.stat(path).st_size
+            except OSError:
+                continue  # Removed since the listing was cached
+    return sorted(found.items())
+
+
+_KB = 1 << 10
+_MB = 1 << 20
+
+
+def format_size(size):
+    """Format a byte count as 'N bytes', 'N.N KB' or 'N.N MB' (integer math)."""
+    if size > _MB:
+        unit, suffix = _MB, "MB"
+    elif size > _KB:
+        unit, suffix = _KB, "KB"
+    else:
+        return f"{size} bytes"
+    # Tenths of a unit, rounded half-to-even like float formatting
+    tenths, rem = divmod(size * 10, unit)
+    if rem * 2 > unit or (rem * 2 == unit and tenths & 1):
+        tenths += 1
+    return f"{tenths // 10}.{tenths % 10} {suffix}"
+
+
 def list_ports():
     """List available serial ports."""
     ports = serial.tools.list_ports.comports()
@@ -151,6 +285,26 @@ def decompress_vgz(data):
     return data
 
 
+def load_vgm(vgm_path):
+    """
+    Load a VGM/VGZ file.
+
+    Raw VGM is returned as a read-only mmap, so only the pages that are
+    actually parsed become resident.
+
+    Returns: (data, file_size) - data is decompressed and supports the
+        buffer protocol (bytes or a read-only mmap)
+    """
+    with open(vgm_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            data = f.read()
+    return decompress_vgz(data), file_size
+
+
 def parse_gd3_tag(data, gd3_offset):
     """Parse GD3 tag for metadata (title, composer, etc.)."""
     if gd3_offset == 0 or gd3_offset >= len(data):
@@ -162,7 +316,7 @@ def parse_gd3_tag(data, gd3_offset):
 
     # GD3 data starts after signature (4), version (4), and length (4)
     gd3_data_start = gd3_offset + 12
-    gd3_length = struct.unpack('<I', data[gd3_offset + 8:gd3_offset + 12])[0]
+    gd3_length = _U32_LE.unpack_from(data, gd3_offset + 8)[0]
     gd3_data = data[gd3_data_start:gd3_data_start + gd3_length]
 
     # Parse UTF-16LE strings separated by null terminators
@@ -189,22 +343,22 @@ def parse_vgm_header(data):
     if data[:4] != b'Vgm ':
         return None
 
-    version = struct.unpack('<I', data[0x08:0x0C])[0]
-    total_samples = struct.unpack('<I', data[0x18:0x1C])[0]
+    version = _U32_LE.unpack_from(data, 0x08)[0]
+    total_samples = _U32_LE.unpack_from(data, 0x18)[0]
 
     # GD3 offset is relative to 0x14
-    gd3_offset_rel = struct.unpack('<I', data[0x14:0x18])[0]
+    gd3_offset_rel = _U32_LE.unpack_from(data, 0x14)[0]
     gd3_offset = (0x14 + gd3_offset_rel) if gd3_offset_rel else 0
 
     # Loop offset is relative to 0x1C
-    loop_offset_rel = struct.unpack('<I', data[0x1C:0x20])[0]
+    loop_offset_rel = _U32_LE.unpack_from(data, 0x1C)[0]
     loop_offset = (0x1C + loop_offset_rel) if loop_offset_rel else 0
 
     # Loop samples (how long the loop section is)
-    loop_samples = struct.unpack('<I', data[0x20:0x24])[0]
+    loop_samples = _U32_LE.unpack_from(data, 0x20)[0]
 
     if version >= 0x150:
-        data_offset_rel = struct.unpack('<I', data[0x34:0x38])[0]
+        data_offset_rel = _U32_LE.unpack_from(data, 0x34)[0]
         data_offset = 0x34 + data_offset_rel if data_offset_rel else 0x40
     else:
         data_offset = 0x40
@@ -229,207 +383,421 @@ def parse_vgm_header(data):
 # VGM Processing
 # =============================================================================
 
-def preprocess_vgm(data, data_offset, loop_offset=0):
-    """
-    Preprocess VGM data:
-    1. Extract PCM data block
-    2. Inline DAC bytes for 0x80-0x8F commands
-    3. Convert to stream of (command_byte, args) tuples
-    4. Track loop point index if loop_offset is provided
+def _build_cmd_len_table():
+    """Total length in bytes (opcode + operands) of each fixed-size VGM command.
 
-    Returns: (commands, loop_command_index)
-        loop_command_index is the index into commands where the loop starts,
-        or None if no loop point.
+    0x66 (end) and 0x67 (data block) are 0: they need special handling.
     """
-    # First pass: extract PCM data block
-    pcm_data = None
-    pos = data_offset
+    table = np.ones(256, dtype=np.uint8)
+    table[0x30:0x40] = 2     # Reserved, 1 operand (dual-chip PSG etc.)
+    table[0x40:0x4F] = 3     # Reserved, 2 operands
+    table[0x4F] = 2          # Game Gear PSG stereo
+    table[0x50] = 2          # PSG write
+    table[0x51:0x60] = 3     # YM2612 / other FM chip writes
+    table[0x61] = 3          # Wait N samples
+    table[0x66] = 0
+    table[0x67] = 0
+    table[0x68] = 12         # PCM RAM write
+    table[0x90] = 5          # DAC stream control
+    table[0x91] = 5
+    table[0x92] = 6
+    table[0x93] = 11
+    table[0x94] = 2
+    table[0x95] = 5
+    table[0xA0:0xC0] = 3     # 2-operand chip writes
+    table[0xC0:0xE0] = 4     # 3-operand chip writes
+    table[0xE0:0x100] = 5    # PCM seek / 4-operand commands
+    return table
+
+
+_CMD_LEN = _build_cmd_len_table()
+_CMD_LEN_BYTES = _CMD_LEN.tobytes()  # Faster to index from pure Python
+
+
+@njit(cache=True)
+def _u32_at(buf, pos):
+    """Read a little-endian uint32 from buf at pos (as a plain int)."""
+    return (np.int64(buf[pos]) | (np.int64(buf[pos + 1]) << 8) |
+            (np.int64(buf[pos + 2]) << 16) | (np.int64(buf[pos + 3]) << 24))
+
+
+@njit(cache=True)
+def _preprocess_walk(buf, data_offset, loop_offset, cmd_len, pcm_start, pcm_len,
+                     track_pcm, out_cmd, out_a0, out_a1, out_argc):
+    """
+    Single walk over the VGM command stream for _preprocess_core().
 
-    while pos < len(data):
-        cmd = data[pos]
-        if cmd == 0x67:  # Data block
-            if pos + 7 <= len(data):
-                block_type = data[pos + 2]
-                block_size = struct.unpack('<I', data[pos + 3:pos + 7])[0]
-                if block_type == 0x00:
-                    pcm_data = data[pos + 7:pos + 7 + block_size]
-                pos += 7 + block_size
-            else:
-                break
-        elif cmd == 0x66:
-            break
-        elif cmd == 0x50:
-            pos += 2
-        elif cmd in (0x52, 0x53):
-            pos += 3
-        elif cmd == 0x61:
-            pos += 3
-        elif cmd in (0x62, 0x63):
-            pos += 1
-        elif 0x70 <= cmd <= 0x7F:
-            pos += 1
-        elif 0x80 <= cmd <= 0x8F:
-            pos += 1
-        elif cmd == 0xE0:
-            pos += 5
-        else:
-            pos += 1
+    When track_pcm is set, PCM data blocks are adopted as they are reached
+    (last type 0x00 block wins); otherwise the given pcm_start/pcm_len are
+    used throughout.
 
-    # Second pass: generate commands with inlined PCM
-    commands = []
+    Returns: (command_count, loop_command_index, pcm_start, pcm_len, stale)
+    where stale is True if a PCM block was adopted after DAC commands had
+    already been emitted, so their inlined bytes may be wrong.
+    """
+    n = len(buf)
+    count = 0
     pos = data_offset
     pcm_pos = 0
-    loop_command_index = None
+    loop_command_index = -1
+    dac_emitted = False
+    stale = False
 
-    while pos < len(data):
+    while pos < n:
         # Check if this position is the loop point
-        if loop_offset and pos == loop_offset and loop_command_index is None:
-            loop_command_index = len(commands)
+        if loop_offset and pos == loop_offset and loop_command_index < 0:
+            loop_command_index = count
 
-        cmd = data[pos]
+        cmd = buf[pos]
 
-        if cmd == 0x67:  # Skip data block
-            block_size = struct.unpack('<I', data[pos + 3:pos + 7])[0]
+        if cmd == 0x67:  # Data block
+            if pos + 7 > n:
+                break
+            block_size = _u32_at(buf, pos + 3)
+            if track_pcm and buf[pos + 2] == 0x00:
+                pcm_start = pos + 7
+                pcm_len = min(block_size, n - pcm_start)
+                if dac_emitted:
+                    stale = True
             pos += 7 + block_size
 
         elif cmd == 0x66:  # End
-            commands.append((CMD_END_OF_STREAM, b''))
+            out_cmd[count] = 0x66
+            out_argc[count] = 0
+            count += 1
             break
 
         elif cmd == 0x50:  # PSG write
-            commands.append((CMD_PSG_WRITE, bytes([data[pos + 1]])))
+            if pos + 2 > n:
+                break
+            out_cmd[count] = 0x50
+            out_a0[count] = buf[pos + 1]
+            out_argc[count] = 1
+            count += 1
             pos += 2
 
-        elif cmd == 0x52:  # YM2612 Port 0
-            commands.append((CMD_YM2612_WRITE_A0, bytes([data[pos + 1], data[pos + 2]])))
-            pos += 3
-
-        elif cmd == 0x53:  # YM2612 Port 1
-            commands.append((CMD_YM2612_WRITE_A1, bytes([data[pos + 1], data[pos + 2]])))
-            pos += 3
-
-        elif cmd == 0x61:  # Wait N samples
-            samples = struct.unpack('<H', data[pos + 1:pos + 3])[0]
-            commands.append((CMD_WAIT_FRAMES, struct.pack('<H', samples)))
+        elif cmd == 0x52 or cmd == 0x53 or cmd == 0x61:  # YM2612 write / wait N
+            if pos + 3 > n:
+                break
+            out_cmd[count] = cmd
+            out_a0[count] = buf[pos + 1]
+            out_a1[count] = buf[pos + 2]
+            out_argc[count] = 2
+            count += 1
             pos += 3
 
-        elif cmd == 0x62:  # Wait NTSC frame
-            commands.append((CMD_WAIT_NTSC, b''))
-            pos += 1
-
-        elif cmd == 0x63:  # Wait PAL frame
-            commands.append((CMD_WAIT_PAL, b''))
-            pos += 1
-
-        elif 0x70 <= cmd <= 0x7F:  # Short wait
-            commands.append((cmd, b''))
+        elif cmd == 0x62 or cmd == 0x63 or (0x70 <= cmd <= 0x7F):  # Frame / short wait
+            out_cmd[count] = cmd
+            out_argc[count] = 0
+            count += 1
             pos += 1
 
         elif 0x80 <= cmd <= 0x8F:  # DAC + wait (inline PCM byte)
-            if pcm_data and pcm_pos < len(pcm_data):
-                dac_byte = pcm_data[pcm_pos]
+            if pcm_pos < pcm_len:
+                out_a0[count] = buf[pcm_start + pcm_pos]
                 pcm_pos += 1
             else:
-                dac_byte = 0x80
-            commands.append((cmd, bytes([dac_byte])))
+                out_a0[count] = 0x80
+            out_cmd[count] = cmd
+            out_argc[count] = 1
+            count += 1
             pos += 1
+            dac_emitted = True
 
         elif cmd == 0xE0:  # PCM seek
-            if pos + 5 <= len(data):
-                pcm_pos = struct.unpack('<I', data[pos + 1:pos + 5])[0]
+            if pos + 5 <= n:
+                pcm_pos = _u32_at(buf, pos + 1)
             pos += 5
 
         else:
-            pos += 1
+            pos += cmd_len[cmd]
 
-    return commands, loop_command_index
+    return count, loop_command_index, pcm_start, pcm_len, stale
 
 
-def apply_wait_optimization(commands, loop_index=None):
+@njit(cache=True)
+def _preprocess_core(buf, data_offset, loop_offset, cmd_len,
+                     out_cmd, out_a0, out_a1, out_argc):
     """
-    Optimize wait commands:
-    1. Merge consecutive waits into single CMD_WAIT_FRAMES
-    2. Convert small waits to short wait commands (0x70-0x7F)
-    3. Use RLE for runs of frame waits
+    Byte-walking core of preprocess_vgm().
 
-    Returns: (optimized_commands, new_loop_index)
+    Decodes the VGM command stream in buf into the parallel output buffers
+    (command byte, first arg, second arg, arg count), inlining PCM bytes for
+    0x80-0x8F commands. cmd_len is the per-opcode length table used to skip
+    commands that aren't emitted. Outputs must hold at least
+    len(buf) - data_offset + 1 entries.
+
+    The data is walked once, picking up the PCM block as it goes. Only if a
+    PCM block turns up after DAC commands were already emitted (legal but
+    rare; real files put the block first) is the stream walked a second
+    time with the final block to fix up those commands.
+
+    Returns: (command_count, loop_command_index) with -1 for no loop point.
     """
-    optimized = []
-    i = 0
-    new_loop_index = None
-
-    def get_wait_samples(cmd, args):
-        """Extract wait samples from a command."""
-        if cmd == CMD_WAIT_NTSC:
-            return FRAME_SAMPLES_NTSC
-        elif cmd == CMD_WAIT_PAL:
-            return FRAME_SAMPLES_PAL
-        elif cmd == CMD_WAIT_FRAMES:
-            return struct.unpack('<H', args)[0]
-        elif 0x70 <= cmd <= 0x7F:
-            return (cmd & 0x0F) + 1
-        return 0
+    count, loop_command_index, pcm_start, pcm_len, stale = _preprocess_walk(
+        buf, data_offset, loop_offset, cmd_len, 0, 0, True,
+        out_cmd, out_a0, out_a1, out_argc)
+
+    if stale:
+        count, loop_command_index, pcm_start, pcm_len, stale = _preprocess_walk(
+            buf, data_offset, loop_offset, cmd_len, pcm_start, pcm_len, False,
+            out_cmd, out_a0, out_a1, out_argc)
+
+    return count, loop_command_index
+
+
+class CommandStream:
+    """
+    Preprocessed VGM command stream in struct-of-arrays form.
+
+    Each command is one entry across four parallel uint8 arrays:
+      cmds - command byte
+      arg0 - first argument byte (0 if unused)
+      arg1 - second argument byte (0 if unused)
+      argc - number of argument bytes (0-2)
 
-    def is_wait_cmd(cmd):
-        return cmd in (CMD_WAIT_NTSC, CMD_WAIT_PAL, CMD_WAIT_FRAMES) or (0x70 <= cmd <= 0x7F)
+    Indexing/iteration still yields (cmd, args) tuples for consumers that
+    walk the stream one command at a time (visualization, offline modes).
+    """
+
+    def __init__(self, cmds, arg0, arg1, argc):
+        self.cmds = cmds
+        self.arg0 = arg0
+        self.arg1 = arg1
+        self.argc = argc
+
+    @classmethod
+    def from_lists(cls, cmds, arg0, arg1, argc):
+        """Build a stream from plain Python lists of ints."""
+        return cls(np.array(cmds, dtype=np.uint8), np.array(arg0, dtype=np.uint8),
+                   np.array(arg1, dtype=np.uint8), np.array(argc, dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.cmds)
+
+    def __getitem__(self, i):
+        argc = self.argc[i]
+        if argc == 0:
+            args = b''
+        elif argc == 1:
+            args = _BYTE1[self.arg0[i]]
+        else:
+            args = bytes((self.arg0[i], self.arg1[i]))
+        return int(self.cmds[i]), args
+
+    def __iter__(self):
+        for cmd, a0, a1, argc in zip(self.cmds.tolist(), self.arg0.tolist(),
+                                     self.arg1.tolist(), self.argc.tolist()):
+            if argc == 0:
+                yield cmd, b''
+            elif argc == 1:
+                yield cmd, _BYTE1[a0]
+            else:
+                yield cmd, bytes((a0, a1))
+
+    def packed(self):
+        """
+        Flat form for fast per-command access from Python loops.
 
-    while i < len(commands):
+        Returns: (cmds, blob, offsets)
+            cmds is a list of command bytes, and command i's args are
+            blob[offsets[i] + 1:offsets[i + 1]].
+        """
+        output, byte_offsets = _serialize_commands(self)
+        return self.cmds.tolist(), output.tobytes(), byte_offsets.tolist()
+
+    def num_bytes(self):
+        """Size of the stream once serialized by commands_to_bytes()."""
+        return len(self.cmds) + int(self.argc.sum())
+
+    def filter(self, keep, loop_index=None):
+        """
+        Return (stream, new_loop_index) keeping only entries where keep is True.
+
+        The loop index is remapped to the first kept command at or after it.
+        """
+        new_loop_index = None
+        if loop_index is not None and loop_index < len(keep):
+            new_loop_index = int(np.count_nonzero(keep[:loop_index]))
+        stream = CommandStream(self.cmds[keep], self.arg0[keep],
+                               self.arg1[keep], self.argc[keep])
+        return stream, new_loop_index
+
+
+def preprocess_vgm(data, data_offset, loop_offset=0):
+    """
+    Preprocess VGM data:
+    1. Extract PCM data block
+    2. Inline DAC bytes for 0x80-0x8F commands
+    3. Convert to a CommandStream
+    4. Track loop point index if loop_offset is provided
+
+    Returns: (commands, loop_command_index)
+        loop_command_index is the index into commands where the loop starts,
+        or None if no loop point.
+    """
+    size = max(len(data) - data_offset, 0) + 1
+    if _HAS_NUMBA:
+        buf = np.frombuffer(data, dtype=np.uint8)
+        outs = [np.zeros(size, dtype=np.uint8) for _ in range(4)]
+    else:
+        buf = data
+        outs = [bytearray(size) for _ in range(4)]
+
+    cmd_len = _CMD_LEN if _HAS_NUMBA else _CMD_LEN_BYTES
+    count, loop_command_index = _preprocess_core(buf, data_offset, loop_offset or 0, cmd_len, *outs)
+
+    commands = CommandStream(*[np.frombuffer(out, dtype=np.uint8)[:count].copy() for out in outs])
+    return commands, (loop_command_index if loop_command_index >= 0 else None)
+
+
+@njit(cache=True)
+def _emit(out_cmd, out_a0, out_a1, out_argc, count, cmd, a0, a1, argc):
+    """Write one command at index count of the output buffers; returns count + 1."""
+    out_cmd[count] = cmd
+    out_a0[count] = a0
+    out_a1[count] = a1
+    out_argc[count] = argc
+    return count + 1
+
+
+@njit(cache=True)
+def _wait_opt_core(cmds, arg0, arg1, argc, loop_index, is_wait, fixed_wait,
+                   out_cmd, out_a0, out_a1, out_argc):
+    """
+    Wait-merging state machine of apply_wait_optimization().
+
+    loop_index is -1 for no loop point. Outputs must hold at least
+    len(cmds) + 1 entries.
+
+    Returns: (command_count, new_loop_index) with -1 for no loop point.
+    """
+    n = len(cmds)
+    count = 0
+    new_loop_index = -1
+    i = 0
+
+    while i < n:
         # Track loop index mapping
-        if loop_index is not None and i == loop_index:
-            new_loop_index = len(optimized)
+        if i == loop_index:
+            new_loop_index = count
 
-        cmd, args = commands[i]
+        cmd = cmds[i]
 
         # Accumulate consecutive waits
-        if is_wait_cmd(cmd):
-            total_samples = get_wait_samples(cmd, args)
+        if is_wait[cmd]:
+            if cmd == CMD_WAIT_FRAMES:
+                total_samples = arg0[i] | (arg1[i] << 8)
+            else:
+                total_samples = fixed_wait[cmd]
             j = i + 1
 
             # Merge consecutive waits, but stop if we hit the loop point
-            while j < len(commands) and is_wait_cmd(commands[j][0]):
+            while j < n and is_wait[cmds[j]]:
                 # Don't merge past the loop point
-                if loop_index is not None and j == loop_index:
+                if j == loop_index:
                     break
-                total_samples += get_wait_samples(commands[j][0], commands[j][1])
+                if cmds[j] == CMD_WAIT_FRAMES:
+                    total_samples += arg0[j] | (arg1[j] << 8)
+                else:
+                    total_samples += fixed_wait[cmds[j]]
                 j += 1
 
             # Output optimized wait(s)
             while total_samples > 0:
                 if total_samples >= FRAME_SAMPLES_NTSC * 2 and total_samples % FRAME_SAMPLES_NTSC == 0:
                     # Multiple NTSC frames - use RLE
-                    frames = total_samples // FRAME_SAMPLES_NTSC
-                    if frames <= 255:
-                        optimized.append((CMD_RLE_WAIT_FRAME_1, bytes([frames])))
-                        total_samples = 0
-                    else:
-                        optimized.append((CMD_RLE_WAIT_FRAME_1, bytes([255])))
-                        total_samples -= 255 * FRAME_SAMPLES_NTSC
+                    # Emit all full 255-frame RLE waits at once, then the remainder
+                    # (a single leftover frame is a plain NTSC wait)
+                    full, frames = divmod(total_samples // FRAME_SAMPLES_NTSC, 255)
+                    for _ in range(full):
+                        count = _emit(out_cmd, out_a0, out_a1, out_argc, count,
+                                      CMD_RLE_WAIT_FRAME_1, 255, 0, 1)
+                    if frames >= 2:
+                        count = _emit(out_cmd, out_a0, out_a1, out_argc, count,
+                                      CMD_RLE_WAIT_FRAME_1, frames, 0, 1)
+                    elif frames == 1:
+                        count = _emit(out_cmd, out_a0, out_a1, out_argc, count, CMD_WAIT_NTSC, 0, 0, 0)
+                    total_samples = 0
                 elif total_samples == FRAME_SAMPLES_NTSC:
-                    optimized.append((CMD_WAIT_NTSC, b''))
+                    count = _emit(out_cmd, out_a0, out_a1, out_argc, count, CMD_WAIT_NTSC, 0, 0, 0)
                     total_samples = 0
                 elif total_samples == FRAME_SAMPLES_PAL:
-                    optimized.append((CMD_WAIT_PAL, b''))
+                    count = _emit(out_cmd, out_a0, out_a1, out_argc, count, CMD_WAIT_PAL, 0, 0, 0)
                     total_samples = 0
                 elif total_samples <= 16:
                     # Short wait 0x70-0x7F (1-16 samples)
-                    optimized.append((0x70 + (total_samples - 1), b''))
+                    count = _emit(out_cmd, out_a0, out_a1, out_argc, count,
+                                  0x70 + (total_samples - 1), 0, 0, 0)
                     total_samples = 0
-                elif total_samples <= 65535:
+                elif total_samples <= _WAIT_MAX_SAMPLES:
                     # General wait
-                    optimized.append((CMD_WAIT_FRAMES, struct.pack('<H', total_samples)))
+                    count = _emit(out_cmd, out_a0, out_a1, out_argc, count,
+                                  CMD_WAIT_FRAMES, total_samples & 0xFF, total_samples >> 8, 2)
                     total_samples = 0
                 else:
                     # Too large - split
-                    optimized.append((CMD_WAIT_FRAMES, struct.pack('<H', 65535)))
-                    total_samples -= 65535
+                    count = _emit(out_cmd, out_a0, out_a1, out_argc, count,
+                                  CMD_WAIT_FRAMES, _WAIT_MAX_SAMPLES & 0xFF, _WAIT_MAX_SAMPLES >> 8, 2)
+                    total_samples -= _WAIT_MAX_SAMPLES
 
             i = j
             continue
 
-        optimized.append((cmd, args))
+        count = _emit(out_cmd, out_a0, out_a1, out_argc, count, cmd, arg0[i], arg1[i], argc[i])
         i += 1
 
-    return optimized, new_loop_index
+    return count, new_loop_index
+
+
+def apply_wait_optimization(commands, loop_index=None):
+    """
+    Optimize wait commands:
+    1. Merge consecutive waits into single CMD_WAIT_FRAMES
+    2. Convert small waits to short wait commands (0x70-0x7F)
+    3. Use RLE for runs of frame waits
+
+    Returns: (optimized_commands, new_loop_index)
+    """
+    # A run of k merged waits never emits more than k commands, so the
+    # input length (plus a spare slot) bounds the output
+    size = len(commands) + 1
+    ins = (commands.cmds, commands.arg0, commands.arg1, commands.argc)
+    if _HAS_NUMBA:
+        ins = [a.astype(np.int64) for a in ins]
+        luts = (_IS_WAIT_ARR, _FIXED_WAIT_ARR)
+        outs = [np.zeros(size, dtype=np.uint8) for _ in range(4)]
+    else:
+        ins = [a.tolist() for a in ins]
+        luts = (_IS_WAIT, _FIXED_WAIT)
+        outs = [bytearray(size) for _ in range(4)]
+
+    count, new_loop_index = _wait_opt_core(
+        *ins, -1 if loop_index is None else loop_index, *luts, *outs)
+
+    optimized = CommandStream(*[np.frombuffer(out, dtype=np.uint8)[:count].copy() for out in outs])
+    return optimized, (new_loop_index if new_loop_index >= 0 else None)
+
+
+def _dac_to_wait(commands, convert, loop_index=None):
+    """
+    Replace the DAC commands selected by convert with their wait portion.
+
+    A 0x8n command becomes short wait 0x7(n-1); with n == 0 it is dropped.
+
+    Returns: (new_commands, new_loop_index)
+    """
+    cmds = commands.cmds
+    wait = cmds & 0x0F
+    keep = ~(convert & (wait == 0))
+
+    converted = CommandStream(
+        np.where(convert, 0x70 + wait - 1, cmds).astype(np.uint8),
+        np.where(convert, 0, commands.arg0).astype(np.uint8),
+        commands.arg1,
+        np.where(convert, 0, commands.argc).astype(np.uint8),
+    )
+    return converted.filter(keep, loop_index)
 
 
 def strip_dac(commands, loop_index=None):
@@ -439,24 +807,9 @@ def strip_dac(commands, loop_index=None):
 
     Returns: (stripped_commands, new_loop_index)
     """
-    stripped = []
-    new_loop_index = None
-
-    for i, (cmd, args) in enumerate(commands):
-        if loop_index is not None and i == loop_index:
-            new_loop_index = len(stripped)
-
-        # DAC + wait commands (0x80-0x8F)
-        if 0x80 <= cmd <= 0x8F:
-            # Extract wait portion and convert to short wait
-            wait = cmd & 0x0F
-            if wait > 0:
-                stripped.append((0x70 + wait - 1, b''))  # Short wait (0x70-0x7F)
-            # If wait is 0, just skip the command entirely
-        else:
-            stripped.append((cmd, args))
-
-    return stripped, new_loop_index
+    cmds = commands.cmds
+    is_dac = (cmds >= 0x80) & (cmds <= 0x8F)
+    return _dac_to_wait(commands, is_dac, loop_index)
 
 
 def apply_dac_rate_reduction(commands, dac_rate=1, loop_index=None):
@@ -471,31 +824,15 @@ def apply_dac_rate_reduction(commands, dac_rate=1, loop_index=None):
     if dac_rate == 1:
         return commands, loop_index  # No reduction
 
-    compressed = []
-    dac_count = 0
-    new_loop_index = None
+    return _dac_to_wait(commands, _dac_skip_mask(commands, dac_rate), loop_index)
 
-    for i, (cmd, args) in enumerate(commands):
-        if loop_index is not None and i == loop_index:
-            new_loop_index = len(compressed)
 
-        # DAC + wait commands (0x80-0x8F)
-        if 0x80 <= cmd <= 0x8F and args:
-            dac_count += 1
-
-            # Rate reduction: skip samples
-            if (dac_count % dac_rate) != 1:
-                # Skip this sample, but keep the wait
-                wait = cmd & 0x0F
-                if wait > 0:
-                    compressed.append((0x70 + wait - 1, b''))  # Short wait
-                continue
-
-            compressed.append((cmd, args))
-        else:
-            compressed.append((cmd, args))
-
-    return compressed, new_loop_index
+def _dac_skip_mask(commands, dac_rate):
+    """Mask of DAC samples dropped by rate reduction (1st, (rate+1)th, ... are kept)."""
+    cmds = commands.cmds
+    is_dac = (cmds >= 0x80) & (cmds <= 0x8F) & (commands.argc > 0)
+    dac_number = np.cumsum(is_dac)
+    return is_dac & ((dac_number % dac_rate) != 1)
 
 
 def detect_chips(commands):
@@ -506,14 +843,16 @@ def detect_chips(commands):
     has_psg = False
     has_ym2612 = False
 
-    for cmd, args in commands:
-        if cmd == CMD_PSG_WRITE:
-            has_psg = True
-        elif cmd in (CMD_YM2612_WRITE_A0, CMD_YM2612_WRITE_A1):
-            has_ym2612 = True
-        # Also check DAC commands (0x80-0x8F) as YM2612
-        elif 0x80 <= cmd <= 0x8F:
-            has_ym2612 = True
+    # Scan in 64KB blocks so streams using both chips can stop early
+    cmds = commands.cmds
+    for start in range(0, len(cmds), 65536):
+        block = cmds[start:start + 65536]
+        if not has_psg:
+            has_psg = bool((block == CMD_PSG_WRITE).any())
+        if not has_ym2612:
+            # Also check DAC commands (0x80-0x8F) as YM2612
+            has_ym2612 = bool(((block == CMD_YM2612_WRITE_A0) | (block == CMD_YM2612_WRITE_A1) |
+                               ((block >= 0x80) & (block <= 0x8F))).any())
 
         if has_psg and has_ym2612:
             break  # Found both, no need to continue
@@ -529,89 +868,192 @@ def attenuate_psg(commands, attenuation_increase=1, loop_index=None):
       - aaaa = attenuation (0=loudest, 15=silent)
 
     Args:
-        commands: List of (cmd, args) tuples
+        commands: CommandStream
         attenuation_increase: How much to increase attenuation (1-15)
         loop_index: Index of loop point in commands
 
     Returns: (modified_commands, new_loop_index)
     """
-    modified = []
-    new_loop_index = None
-
-    for i, (cmd, args) in enumerate(commands):
-        if loop_index is not None and i == loop_index:
-            new_loop_index = len(modified)
-
-        if cmd == CMD_PSG_WRITE and args:
-            psg_byte = args[0]
-            # Check if this is an attenuation command (bit 4 set, bit 7 set)
-            if (psg_byte & 0x90) == 0x90:
-                # Extract current attenuation (bits 0-3)
-                current_atten = psg_byte & 0x0F
+    modified = CommandStream(commands.cmds, _attenuated_psg_args(commands, attenuation_increase),
+                             commands.arg1, commands.argc)
+    return modified, loop_index if loop_index is not None and loop_index < len(commands) else None
+
+
+_ATTEN_LUTS = {}
+
+
+def _psg_atten_lut(attenuation_increase):
+    """256-entry PSG byte translation table for an attenuation increase (cached)."""
+    lut = _ATTEN_LUTS.get(attenuation_increase)
+    if lut is None:
+        lut = np.arange(256, dtype=np.uint8)
+        for b in range(256):
+            # Attenuation commands: bit 7 and bit 4 set
+            if (b & 0x90) == 0x90:
                 # If already silent (15), leave it silent
                 # Otherwise increase attenuation but cap at 14 to preserve audibility
-                if current_atten == 15:
-                    new_atten = 15
-                else:
-                    new_atten = min(14, current_atten + attenuation_increase)
-                # Rebuild the byte
-                new_byte = (psg_byte & 0xF0) | new_atten
-                modified.append((cmd, bytes([new_byte])))
-            else:
-                modified.append((cmd, args))
-        else:
-            modified.append((cmd, args))
+                current_atten = b & 0x0F
+                new_atten = 15 if current_atten == 15 else min(14, current_atten + attenuation_increase)
+                lut[b] = (b & 0xF0) | new_atten
+        _ATTEN_LUTS[attenuation_increase] = lut
+    return lut
+
+
+def _attenuated_psg_args(commands, attenuation_increase):
+    """Return a copy of commands.arg0 with PSG attenuation writes turned down."""
+    arg0 = commands.arg0.copy()
+    is_psg = (commands.cmds == CMD_PSG_WRITE) & (commands.argc > 0)
+    arg0[is_psg] = _psg_atten_lut(attenuation_increase)[arg0[is_psg]]
+    return arg0
+
+
+def build_stream(commands, loop_index=None, psg_attenuation=0, no_dac=False, dac_rate=1):
+    """Run the post-preprocess pipeline in a single pass over the arrays.
+
+    Equivalent to attenuate_psg -> strip_dac / apply_dac_rate_reduction ->
+    apply_wait_optimization, but the PSG rewrite and DAC conversion share one
+    output materialization instead of building a stream per stage.
+
+    Args:
+        commands: CommandStream from preprocess_vgm()
+        loop_index: Index of loop point in commands
+        psg_attenuation: PSG attenuation increase (0 = leave PSG volume alone)
+        no_dac: Strip all DAC samples (keeping their waits)
+        dac_rate: DAC rate reduction factor when not stripping (1 = full rate)
 
-    return modified, new_loop_index
+    Returns: (optimized_commands, new_loop_index)
+    """
+    arg0 = commands.arg0
+    if psg_attenuation:
+        arg0 = _attenuated_psg_args(commands, psg_attenuation)
+    commands = CommandStream(commands.cmds, arg0, commands.arg1, commands.argc)
+
+    if no_dac:
+        cmds = commands.cmds
+        commands, loop_index = _dac_to_wait(commands, (cmds >= 0x80) & (cmds <= 0x8F), loop_index)
+    elif dac_rate > 1:
+        commands, loop_index = _dac_to_wait(commands, _dac_skip_mask(commands, dac_rate), loop_index)
+
+    return apply_wait_optimization(commands, loop_index)
 
 
 def commands_to_bytes(commands, loop_index=None):
-    """Convert command list to raw bytes.
+    """Convert a CommandStream to raw bytes.
 
     Returns: (bytes, loop_byte_offset, byte_to_samples)
         loop_byte_offset is the byte offset where the loop starts, or None.
-        byte_to_samples is a list mapping byte offset to cumulative sample count.
+        byte_to_samples is an array mapping byte offset to cumulative sample count.
     """
-    output = bytearray()
+    output, byte_offsets = _serialize_commands(commands)
+    starts = byte_offsets[:-1]
+
     loop_byte_offset = None
-    byte_to_samples = []  # byte_to_samples[i] = samples elapsed at byte i
-    cumulative_samples = 0
-
-    for i, (cmd, args) in enumerate(commands):
-        if loop_index is not None and i == loop_index:
-            loop_byte_offset = len(output)
-
-        # Record sample count at start of this command
-        start_pos = len(output)
-        output.append(cmd)
-        output.extend(args)
-
-        # Fill byte_to_samples for all bytes of this command
-        cmd_len = len(output) - start_pos
-        for _ in range(cmd_len):
-            byte_to_samples.append(cumulative_samples)
-
-        # Calculate samples for wait commands (after the command)
-        if cmd == CMD_WAIT_NTSC:
-            cumulative_samples += FRAME_SAMPLES_NTSC
-        elif cmd == CMD_WAIT_PAL:
-            cumulative_samples += FRAME_SAMPLES_PAL
-        elif cmd == CMD_WAIT_FRAMES and len(args) >= 2:
-            cumulative_samples += args[0] | (args[1] << 8)
-        elif 0x70 <= cmd <= 0x7F:
-            cumulative_samples += (cmd & 0x0F) + 1
-        elif 0x80 <= cmd <= 0x8F:
-            cumulative_samples += cmd & 0x0F
-        elif cmd == CMD_RLE_WAIT_FRAME_1 and args:
-            cumulative_samples += args[0] * FRAME_SAMPLES_NTSC
+    if loop_index is not None and loop_index < len(commands):
+        loop_byte_offset = int(starts[loop_index])
+
+    # byte_to_samples[i] = samples elapsed at byte i
+    cumulative_samples, _ = command_sample_times(commands)
+    byte_to_samples = np.repeat(cumulative_samples, np.diff(byte_offsets))
+
+    return output.tobytes(), loop_byte_offset, byte_to_samples
+
+
+def _serialize_commands(commands):
+    """Lay a CommandStream out as raw bytes.
+
+    Returns: (output, byte_offsets)
+        output is a uint8 array; command i occupies
+        output[byte_offsets[i]:byte_offsets[i + 1]].
+    """
+    cmds = commands.cmds
+    argc = commands.argc
+
+    # Byte offset of each command in the output
+    byte_offsets = np.zeros(len(cmds) + 1, dtype=np.int64)
+    np.cumsum(1 + argc.astype(np.int64), out=byte_offsets[1:])
+    starts = byte_offsets[:-1]
+
+    output = np.zeros(int(byte_offsets[-1]), dtype=np.uint8)
+    output[starts] = cmds
+    has_arg0 = argc >= 1
+    output[starts[has_arg0] + 1] = commands.arg0[has_arg0]
+    has_arg1 = argc >= 2
+    output[starts[has_arg1] + 2] = commands.arg1[has_arg1]
+    return output, byte_offsets
+
 
-    return bytes(output), loop_byte_offset, byte_to_samples
+def command_wait_samples(commands):
+    """Samples each command of a CommandStream waits (applied after the command).
+
+    Returns: int64 array with one entry per command
+    """
+    cmds = commands.cmds
+    arg0 = commands.arg0
+    arg1 = commands.arg1
+    argc = commands.argc
+
+    waits = np.zeros(len(cmds), dtype=np.int64)
+    waits[cmds == CMD_WAIT_NTSC] = FRAME_SAMPLES_NTSC
+    waits[cmds == CMD_WAIT_PAL] = FRAME_SAMPLES_PAL
+    m = (cmds == CMD_WAIT_FRAMES) & (argc >= 2)
+    waits[m] = arg0[m].astype(np.int64) | (arg1[m].astype(np.int64) << 8)
+    # 0x7n waits n+1 samples, 0x8n (DAC write) waits n: one high-nibble test each
+    high = cmds >> 4
+    low = (cmds & 0x0F).astype(np.int64)
+    m = high == 0x7
+    waits[m] = low[m] + 1
+    m = high == 0x8
+    waits[m] = low[m]
+    m = (cmds == CMD_RLE_WAIT_FRAME_1) & (argc >= 1)
+    waits[m] = arg0[m].astype(np.int64) * FRAME_SAMPLES_NTSC
+    return waits
+
+
+def command_sample_times(commands, waits=None):
+    """Cumulative sample time at which each command of a CommandStream starts.
+
+    waits may pass in an already computed command_wait_samples() array.
+
+    Returns: (start_samples, total_samples)
+        start_samples is a sorted int64 array with one entry per command.
+    """
+    if waits is None:
+        waits = command_wait_samples(commands)
+    start_samples = np.zeros(len(waits), dtype=np.int64)
+    np.cumsum(waits[:-1], out=start_samples[1:])
+    return start_samples, int(waits.sum())
+
+
+def command_index_at(start_samples, target_samples):
+    """Index of the command playing at target_samples (see command_sample_times)."""
+    return max(int(np.searchsorted(start_samples, target_samples, side='right')) - 1, 0)
 
 
 # =============================================================================
 # Streaming
 # =============================================================================
 
+def chunk_checksums(data, chunk_size):
+    """Precompute the protocol checksum of every chunk_size chunk of data.
+
+    The checksum is the XOR of the chunk length and all data bytes; the last
+    chunk may be shorter than chunk_size.
+
+    Returns: bytes with one checksum per chunk (index = offset // chunk_size)
+    """
+    arr = np.frombuffer(data, dtype=np.uint8)
+    full = len(arr) // chunk_size
+    blocks = arr[:full * chunk_size].reshape(full, chunk_size)
+    checksums = np.bitwise_xor.reduce(blocks, axis=1) ^ np.uint8(chunk_size)
+
+    tail = arr[full * chunk_size:]
+    if len(tail):
+        tail_checksum = np.bitwise_xor.reduce(tail) ^ np.uint8(len(tail))
+        checksums = np.append(checksums, tail_checksum)
+
+    return checksums.astype(np.uint8).tobytes()
+
+
 def stream_vgm(port, baud, vgm_path, dac_rate=None, no_dac=False, loop_count=None, verbose=False):
     """Stream VGM file using binary protocol.
 
@@ -622,11 +1064,7 @@ def stream_vgm(port, baud, vgm_path, dac_rate=None, no_dac=False, loop_count=Non
 
     # Load file
     print(f"\nLoading: {os.path.basename(vgm_path)}")
-    with open(vgm_path, 'rb') as f:
-        data = f.read()
-
-    original_size = len(data)
-    data = decompress_vgz(data)
+    data, original_size = load_vgm(vgm_path)
     if len(data) != original_size:
         print(f"  Decompressed: {original_size:,} -> {len(data):,} bytes")
 
@@ -649,7 +1087,7 @@ def stream_vgm(port, baud, vgm_path, dac_rate=None, no_dac=False, loop_count=Non
     print("  Preprocessing VGM...")
     commands, loop_index = preprocess_vgm(data, header['data_offset'], header['loop_offset'])
     original_cmd_count = len(commands)
-    original_bytes = sum(1 + len(args) for cmd, args in commands)
+    original_bytes = commands.num_bytes()
 
     # Connect
     print(f"\nConnecting to {port} at {baud} baud...")
@@ -674,7 +1112,7 @@ def stream_vgm(port, baud, vgm_path, dac_rate=None, no_dac=False, loop_count=Non
             print(f"  Retry {attempt}...")
 
         ser.reset_input_buffer()
-        ser.write(bytes([CMD_PING]))
+        ser.write(_BYTE1[CMD_PING])
 
         # Wait for ACK, BOARD_TYPE, then READY
         got_ack = False
@@ -708,21 +1146,20 @@ def stream_vgm(port, baud, vgm_path, dac_rate=None, no_dac=False, loop_count=Non
 
     # Detect chips and apply PSG attenuation if both FM and PSG are present
     has_psg, has_ym2612 = detect_chips(commands)
-    if has_psg and has_ym2612:
-        commands, loop_index = attenuate_psg(commands, attenuation_increase=2, loop_index=loop_index)
+    psg_attenuation = 2 if has_psg and has_ym2612 else 0
+    if psg_attenuation:
         print(f"  PSG attenuated for FM+PSG mix")
 
     # Apply DAC processing (now that we know board type)
     effective_dac_rate = dac_rate if dac_rate is not None else default_dac_rate
     if no_dac:
-        commands, loop_index = strip_dac(commands, loop_index)
         print(f"  DAC stripped (FM/PSG only)")
     elif effective_dac_rate > 1:
-        commands, loop_index = apply_dac_rate_reduction(commands, effective_dac_rate, loop_index)
         print(f"  DAC rate reduction: 1/{effective_dac_rate} (keeping every {effective_dac_rate}th sample)")
 
-    # Apply wait optimization (merges and RLE)
-    commands, loop_index = apply_wait_optimization(commands, loop_index)
+    # Apply attenuation, DAC processing and wait optimization (merges and RLE)
+    commands, loop_index = build_stream(commands, loop_index, psg_attenuation=psg_attenuation,
+                                        no_dac=no_dac, dac_rate=effective_dac_rate)
     print(f"  Wait optimization: {original_cmd_count} -> {len(commands)} commands")
 
     # Convert to bytes
@@ -742,33 +1179,34 @@ def stream_vgm(port, baud, vgm_path, dac_rate=None, no_dac=False, loop_count=Non
     start_time = time.time()
     last_progress = -1
     retransmits = 0
-    pending_chunks = []
+    pending_chunks = deque()
     chunks_sent = 0  # Debug counter
 
-    def send_chunk(data):
-        """Send a chunk with header, length, data, and checksum."""
+    # Packet buffer reused for every chunk: header, length, data, checksum
+    packet = bytearray(chunk_size + 3)
+    packet[0] = CHUNK_HEADER
+    packet_view = memoryview(packet)
+
+    def send_chunk(s_pos, e_pos):
+        """Send current_data[s_pos:e_pos] with header, length, data, and checksum."""
         nonlocal chunks_sent
         chunks_sent += 1
-        length = len(data)
-        checksum = length
-        for b in data:
-            checksum ^= b
-        packet = bytes([CHUNK_HEADER, length]) + data + bytes([checksum & 0xFF])
-        ser.write(packet)
-
-    all_bytes_received = {}  # Debug: track ALL bytes
+        length = e_pos - s_pos
+        packet[1] = length
+        packet_view[2:2 + length] = current_data[s_pos:e_pos]
+        packet[2 + length] = current_checksums[s_pos // chunk_size]
+        ser.write(packet_view[:3 + length])
+
+    all_bytes_received = Counter()  # Debug: track ALL bytes (verbose only)
     def check_responses():
         """Check for READY/NAK signals. Returns (acks, naks) count."""
-        acks = 0
-        naks = 0
-        while ser.in_waiting:
-            b = ser.read(1)[0]
-            all_bytes_received[b] = all_bytes_received.get(b, 0) + 1
-            if b == FLOW_READY:
-                acks += 1
-            elif b == FLOW_NAK:
-                naks += 1
-        return acks, naks
+        waiting = ser.in_waiting
+        if not waiting:
+            return 0, 0
+        received = ser.read(waiting)  # One read for everything pending
+        if verbose:
+            all_bytes_received.update(received)
+        return received.count(FLOW_READY), received.count(FLOW_NAK)
 
     def wait_for_response(timeout=0.5):
         """Wait for READY or NAK. Returns (acks, naks) count."""
@@ -795,30 +1233,37 @@ def stream_vgm(port, baud, vgm_path, dac_rate=None, no_dac=False, loop_count=Non
             else:
                 plays_remaining = loop_count
 
+        # Slices of the stream (main/loop sections and chunks) are zero-copy views
+        stream_view = memoryview(stream_data)
+
         # For looping: we need to strip the END_OF_STREAM command from the data
         # and only send it when we're truly done
         if is_looping:
             # Remove trailing END_OF_STREAM (0x66) if present
             if stream_data and stream_data[-1] == CMD_END_OF_STREAM:
-                stream_data_main = stream_data[:-1]
+                stream_data_main = stream_view[:-1]
             else:
-                stream_data_main = stream_data
+                stream_data_main = stream_view
 
             # Loop section is from loop point to end (without END_OF_STREAM)
             loop_start = loop_byte_offset if loop_byte_offset else 0
             stream_data_loop = stream_data_main[loop_start:]
+            loop_checksums = chunk_checksums(stream_data_loop, chunk_size)
         else:
-            stream_data_main = stream_data
+            stream_data_main = stream_view
+        main_checksums = chunk_checksums(stream_data_main, chunk_size)
 
         # Streaming state
         pos = 0
         total_bytes_streamed = 0
         loop_number = 1
-        pending_chunks = []
+        pending_chunks = deque()
+        in_flight_bytes = 0  # Total size of pending_chunks
         last_progress = -1
 
         # Which data are we currently streaming?
         current_data = stream_data_main
+        current_checksums = main_checksums
         current_label = ""
 
         while True:
@@ -832,9 +1277,9 @@ def stream_vgm(port, baud, vgm_path, dac_rate=None, no_dac=False, loop_count=Non
             # Send chunks up to pipeline limit
             while len(pending_chunks) < chunks_in_flight and pos < len(current_data):
                 chunk_end = min(pos + chunk_size, len(current_data))
-                chunk_data = current_data[pos:chunk_end]
-                send_chunk(chunk_data)
+                send_chunk(pos, chunk_end)
                 pending_chunks.append((pos, chunk_end))
+                in_flight_bytes += chunk_end - pos
                 pos = chunk_end
 
             # Check for responses
@@ -843,31 +1288,33 @@ def stream_vgm(port, baud, vgm_path, dac_rate=None, no_dac=False, loop_count=Non
             # Handle NAKs - retransmit
             if naks > 0:
                 retransmits += naks
-                chunks_to_resend = pending_chunks[:naks]
-                pending_chunks = pending_chunks[naks:]
-                for s_pos, e_pos in chunks_to_resend:
-                    send_chunk(current_data[s_pos:e_pos])
+                for _ in range(min(naks, len(pending_chunks))):
+                    s_pos, e_pos = pending_chunks.popleft()
+                    send_chunk(s_pos, e_pos)
                     pending_chunks.append((s_pos, e_pos))
 
             # Handle ACKs
             if acks > 0:
-                pending_chunks = pending_chunks[acks:]
+                for _ in range(min(acks, len(pending_chunks))):
+                    s_pos, e_pos = pending_chunks.popleft()
+                    in_flight_bytes -= e_pos - s_pos
 
             # If pipeline full or done sending or can't send, wait for responses
             if pending_chunks and len(pending_chunks) >= chunks_in_flight:
                 acks, naks = wait_for_response(0.1)
                 if naks > 0:
                     retransmits += naks
-                    chunks_to_resend = pending_chunks[:naks]
-                    pending_chunks = pending_chunks[naks:]
-                    for s_pos, e_pos in chunks_to_resend:
-                        send_chunk(current_data[s_pos:e_pos])
+                    for _ in range(min(naks, len(pending_chunks))):
+                        s_pos, e_pos = pending_chunks.popleft()
+                        send_chunk(s_pos, e_pos)
                         pending_chunks.append((s_pos, e_pos))
                 if acks > 0:
-                    pending_chunks = pending_chunks[acks:]
+                    for _ in range(min(acks, len(pending_chunks))):
+                        s_pos, e_pos = pending_chunks.popleft()
+                        in_flight_bytes -= e_pos - s_pos
 
             # Progress display
-            confirmed_pos = pos - sum(end - start for start, end in pending_chunks)
+            confirmed_pos = pos - in_flight_bytes
             progress = confirmed_pos * 100 // len(current_data) if len(current_data) > 0 else 100
             if progress != last_progress:
                 last_progress = progress
@@ -889,7 +1336,7 @@ def stream_vgm(port, baud, vgm_path, dac_rate=None, no_dac=False, loop_count=Non
                     else:
                         # Done looping - wait for pending chunks then exit
                         if not pending_chunks:
-                            ser.write(bytes([CMD_END_OF_STREAM]))
+                            ser.write(_BYTE1[CMD_END_OF_STREAM])
                             total_bytes_streamed += len(current_data)
                             break
                         continue  # Keep waiting for ACKs
@@ -904,6 +1351,7 @@ def stream_vgm(port, baud, vgm_path, dac_rate=None, no_dac=False, loop_count=Non
                     pos = 0
                     last_progress = -1
                     current_data = stream_data_loop
+                    current_checksums = loop_checksums
                     print(f"\n  Starting loop {loop_number}...")
                 else:
                     # Not looping - send end marker, device will ACK pending chunks
@@ -911,7 +1359,7 @@ def stream_vgm(port, baud, vgm_path, dac_rate=None, no_dac=False, loop_count=Non
                     break
 
         # Send end marker and wait for final ACK
-        ser.write(bytes([CHUNK_END]))
+        ser.write(_BYTE1[CHUNK_END])
         wait_for_response(1.0)
 
         print(f"\n\nStream complete! Waiting for playback...")
@@ -930,7 +1378,8 @@ def stream_vgm(port, baud, vgm_path, dac_rate=None, no_dac=False, loop_count=Non
         print(f"\nStats:")
         print(f"  Total bytes streamed: {total_bytes_streamed:,}")
         print(f"  Chunks sent: {chunks_sent}, NAKs: {retransmits} ({retransmits*100//max(chunks_sent,1)}%)")
-        print(f"  All bytes received: {dict(sorted([(hex(k), v) for k, v in all_bytes_received.items()]))}")
+        if verbose:
+            print(f"  All bytes received: {dict(sorted([(hex(k), v) for k, v in all_bytes_received.items()]))}")
         if is_looping:
             print(f"  Loops: {loop_number}")
         print(f"  Time: {elapsed:.1f}s")
@@ -951,192 +1400,248 @@ def stream_vgm(port, baud, vgm_path, dac_rate=None, no_dac=False, loop_count=Non
 
 def interactive_wizard():
     """Interactive mode for users who run without arguments."""
-    print("=" * 60)
-    print("  Genesis Engine VGM Streamer")
-    print("=" * 60)
-    print()
-
-    # Step 1: Find VGM files in current directory AND script directory
-    vgm_files = []
+    # Search the current directory AND the script directory; neither
+    # changes between replays, so resolve them once
+    cwd_abs = os.path.abspath('.')
     script_dir = os.path.dirname(os.path.abspath(__file__))
     search_dirs = ['.']  # Current directory
-    if script_dir != os.path.abspath('.'):
+    try:
+        same_dir = os.path.samefile(script_dir, cwd_abs)
+    except OSError:
+        same_dir = script_dir == cwd_abs
+    if not same_dir:
         search_dirs.append(script_dir)  # Script directory (if different)
 
-    for search_dir in search_dirs:
-        for ext in ['*.vgm', '*.vgz', '*.VGM', '*.VGZ']:
-            pattern = os.path.join(search_dir, ext)
-            vgm_files.extend(glob.glob(pattern))
+    while True:
+        print("=" * 60)
+        print("  Genesis Engine VGM Streamer")
+        print("=" * 60)
+        print()
 
-    # Remove duplicates and sort
-    vgm_files = sorted(set(os.path.normpath(f) for f in vgm_files))
+        # Step 1: Find VGM files
+        # (path, size) pairs, de-duplicated and sorted
+        vgm_files = _find_vgm(search_dirs)
+
+        if not vgm_files:
+            print("No VGM/VGZ files found.")
+            print()
+            print("Searched:")
+            print(f"  - Current directory: {cwd_abs}")
+            if len(search_dirs) > 1:
+                print(f"  - Script directory:  {script_dir}")
+            print()
+            print("Please either:")
+            print("  1. Copy some .vgm or .vgz files to one of these folders")
+            print("  2. Run with a file path: python stream_vgm.py path/to/song.vgm")
+            print()
+            input("Press Enter to exit...")
+            return 1
 
-    if not vgm_files:
-        print("No VGM/VGZ files found.")
-        print()
-        print("Searched:")
-        print(f"  - Current directory: {os.path.abspath('.')}")
-        if len(search_dirs) > 1:
-            print(f"  - Script directory:  {script_dir}")
+        # Step 2: Select file
+        print(f"Found {len(vgm_files)} VGM file(s):")
         print()
-        print("Please either:")
-        print("  1. Copy some .vgm or .vgz files to one of these folders")
-        print("  2. Run with a file path: python stream_vgm.py path/to/song.vgm")
+        lines = [f"  {i}. {f} ({format_size(size)})" for i, (f, size) in enumerate(vgm_files, 1)]
+        sys.stdout.write("\n".join(lines) + "\n")
         print()
-        input("Press Enter to exit...")
-        return 1
 
-    # Step 2: Select file
-    print(f"Found {len(vgm_files)} VGM file(s):")
-    print()
-    for i, f in enumerate(vgm_files, 1):
-        # Get file size
-        size = os.path.getsize(f)
-        if size > 1024 * 1024:
-            size_str = f"{size / 1024 / 1024:.1f} MB"
-        elif size > 1024:
-            size_str = f"{size / 1024:.1f} KB"
+        if len(vgm_files) == 1:
+            selected_file = vgm_files[0][0]
+            print(f"Selected: {selected_file}")
         else:
-            size_str = f"{size} bytes"
-        print(f"  {i}. {f} ({size_str})")
-    print()
+            prompt = f"Select a file (1-{len(vgm_files)}): "
+            out_of_range = f"Please enter a number between 1 and {len(vgm_files)}"
+            while True:
+                try:
+                    choice = input(prompt).strip()
+                    if not choice:
+                        continue
+                    idx = int(choice) - 1
+                    if 0 <= idx < len(vgm_files):
+                        selected_file = vgm_files[idx][0]
+                        break
+                    print(out_of_range)
+                except ValueError:
+                    print("Please enter a number")
+                except KeyboardInterrupt:
+                    print("\nCancelled.")
+                    return 1
 
-    if len(vgm_files) == 1:
-        selected_file = vgm_files[0]
-        print(f"Selected: {selected_file}")
-    else:
-        while True:
-            try:
-                choice = input(f"Select a file (1-{len(vgm_files)}): ").strip()
-                if not choice:
-                    continue
-                idx = int(choice) - 1
-                if 0 <= idx < len(vgm_files):
-                    selected_file = vgm_files[idx]
-                    break
-                print(f"Please enter a number between 1 and {len(vgm_files)}")
-            except ValueError:
-                print("Please enter a number")
-            except KeyboardInterrupt:
-                print("\nCancelled.")
-                return 1
+        print()
 
-    print()
+        # Step 3: Find serial port
+        print("Looking for Genesis Engine board...")
+        ports = cached_comports()
+        if not ports:
+            # Try again with a fresh enumeration before giving up
+            ports = cached_comports(rescan=True)
+
+        if not ports:
+            print()
+            print("ERROR: No serial ports found!")
+            print()
+            print("Please check:")
+            print("  1. Is the board plugged in via USB?")
+            print("  2. Is the correct driver installed?")
+            print()
+            input("Press Enter to exit...")
+            return 1
 
-    # Step 3: Find serial port
-    print("Looking for Genesis Engine board...")
-    ports = serial.tools.list_ports.comports()
+        # Try to auto-detect
+        auto_port = find_arduino_port(ports)
 
-    if not ports:
-        print()
-        print("ERROR: No serial ports found!")
-        print()
-        print("Please check:")
-        print("  1. Is the board plugged in via USB?")
-        print("  2. Is the correct driver installed?")
-        print()
-        input("Press Enter to exit...")
-        return 1
+        if auto_port:
+            print(f"  Found: {auto_port}")
+            selected_port = auto_port
+        elif len(ports) == 1:
+            selected_port = ports[0].device
+            print(f"  Found: {selected_port} ({ports[0].description})")
+        else:
+            print()
+            print("Multiple serial ports found:")
+            print("\n".join(f"  {i}. {port.device} - {port.description}"
+                            for i, port in enumerate(ports, 1)))
+            print()
+            prompt = f"Select port (1-{len(ports)}): "
+            out_of_range = f"Please enter a number between 1 and {len(ports)}"
+            while True:
+                try:
+                    choice = input(prompt).strip()
+                    if not choice:
+                        continue
+                    idx = int(choice) - 1
+                    if 0 <= idx < len(ports):
+                        selected_port = ports[idx].device
+                        break
+                    print(out_of_range)
+                except ValueError:
+                    print("Please enter a number")
+                except KeyboardInterrupt:
+                    print("\nCancelled.")
+                    return 1
 
-    # Try to auto-detect
-    auto_port = find_arduino_port()
+        print()
 
-    if auto_port:
-        print(f"  Found: {auto_port}")
-        selected_port = auto_port
-    elif len(ports) == 1:
-        selected_port = ports[0].device
-        print(f"  Found: {selected_port} ({ports[0].description})")
-    else:
+        # Step 4: Ask about looping
         print()
-        print("Multiple serial ports found:")
-        for i, port in enumerate(ports, 1):
-            print(f"  {i}. {port.device} - {port.description}")
+        print("Playback options:")
         print()
+        print("  1. Play once")
+        print("  2. Loop forever (Ctrl+C to stop)")
+        print()
+
+        loop_count = None
         while True:
             try:
-                choice = input(f"Select port (1-{len(ports)}): ").strip()
-                if not choice:
-                    continue
-                idx = int(choice) - 1
-                if 0 <= idx < len(ports):
-                    selected_port = ports[idx].device
+                choice = input("Select option (1-2) [1]: ").strip()
+                if not choice or choice == '1':
+                    loop_count = None
                     break
-                print(f"Please enter a number between 1 and {len(ports)}")
-            except ValueError:
-                print("Please enter a number")
+                elif choice == '2':
+                    loop_count = 0  # 0 = infinite
+                    break
+                print("Please enter 1 or 2")
             except KeyboardInterrupt:
                 print("\nCancelled.")
                 return 1
 
-    print()
-
-    # Step 4: Ask about looping
-    print()
-    print("Playback options:")
-    print()
-    print("  1. Play once")
-    print("  2. Loop forever (Ctrl+C to stop)")
-    print()
+        print()
+        print("-" * 60)
+        print(f"  File: {selected_file}")
+        print(f"  Port: {selected_port}")
+        print(f"  Loop: {'Forever (Ctrl+C to stop)' if loop_count == 0 else 'Once'}")
+        print("-" * 60)
+        print()
 
-    loop_count = None
-    while True:
         try:
-            choice = input("Select option (1-2) [1]: ").strip()
-            if not choice or choice == '1':
-                loop_count = None
-                break
-            elif choice == '2':
-                loop_count = 0  # 0 = infinite
-                break
-            print("Please enter 1 or 2")
+            input("Press Enter to start streaming (Ctrl+C to cancel)...")
         except KeyboardInterrupt:
             print("\nCancelled.")
             return 1
 
-    print()
-    print("-" * 60)
-    print(f"  File: {selected_file}")
-    print(f"  Port: {selected_port}")
-    print(f"  Loop: {'Forever (Ctrl+C to stop)' if loop_count == 0 else 'Once'}")
-    print("-" * 60)
-    print()
-
-    try:
-        input("Press Enter to start streaming (Ctrl+C to cancel)...")
-    except KeyboardInterrupt:
-        print("\nCancelled.")
-        return 1
+        # Stream!
+        success = stream_vgm(
+            selected_port,
+            DEFAULT_BAUD,
+            selected_file,
+            dac_rate=None,  # Use board default
+            no_dac=False,
+            loop_count=loop_count,
+            verbose=False
+        )
 
-    # Stream!
-    success = stream_vgm(
-        selected_port,
-        DEFAULT_BAUD,
-        selected_file,
-        dac_rate=None,  # Use board default
-        no_dac=False,
-        loop_count=loop_count,
-        verbose=False
-    )
+        if not success:
+            return 1
 
-    if success:
         print()
         # Ask if they want to play another
         try:
             again = input("Play another file? (y/n) [n]: ").strip().lower()
-            if again in ('y', 'yes'):
-                print()
-                return interactive_wizard()  # Restart wizard
         except KeyboardInterrupt:
-            pass
-
-    return 0 if success else 1
+            return 0
+        if again not in _YES:
+            return 0
+        print()
 
 
 # =============================================================================
 # Visual Streaming
 # =============================================================================
 
+def _coalesce_writes(cmd_table, blob, offsets, start, end):
+    """
+    Collapse the chip writes of commands [start, end) to their final state.
+
+    Used when the visualization skips ahead: waits are dropped (no samples
+    are generated for the skipped span) and each YM2612 register keeps only
+    its last value, in order of last write. Key on/off (0x28) is tracked per
+    channel and DAC bytes become plain register 0x2A writes. Frequency
+    writes go through a shared latch: 0xA4-0xA6/0xAC-0xAE only stage the
+    high bits and the next 0xA0-0xA2/0xA8-0xAA write commits them (the latch
+    keeps its value). Each commit register keeps its last write, preceded
+    by the latch value current at that point (none if the latch was set
+    before the span). PSG writes are latch/data sequences, so all of them
+    are kept in order.
+
+    Returns: list of (cmd, args) to replay through the interceptor
+    """
+    ym_writes = {}
+    freq_latches = {}
+    psg_writes = []
+    for i in range(start, end):
+        cmd = cmd_table[i]
+        if cmd == CMD_YM2612_WRITE_A0 or cmd == CMD_YM2612_WRITE_A1:
+            reg, data = blob[offsets[i] + 1], blob[offsets[i] + 2]
+            write = (cmd, bytes((reg, data)))
+            if reg == 0x28:
+                key = (cmd, reg, data & 0x07)
+            elif 0xA0 <= reg <= 0xAF:
+                bank = (cmd, 'latch', reg & 0x08)
+                if reg & 0x04:
+                    freq_latches[bank] = write
+                    key = bank
+                else:
+                    # The commit replays its own latch, so a pending latch
+                    # entry is only needed if set again after this
+                    ym_writes.pop(bank, None)
+                    latch = freq_latches.get(bank)
+                    key = (cmd, reg)
+                    ym_writes.pop(key, None)
+                    ym_writes[key] = (latch, write) if latch else (write,)
+                    continue
+            else:
+                key = (cmd, reg)
+        elif 0x80 <= cmd <= 0x8F:
+            key = (CMD_YM2612_WRITE_A0, 0x2A)
+            write = (CMD_YM2612_WRITE_A0, bytes((0x2A, blob[offsets[i] + 1])))
+        else:
+            if cmd == CMD_PSG_WRITE:
+                psg_writes.append((cmd, blob[offsets[i] + 1:offsets[i + 1]]))
+            continue
+        ym_writes.pop(key, None)
+        ym_writes[key] = (write,)
+    return [write for writes in ym_writes.values() for write in writes] + psg_writes
+
+
 class VisualStreamer:
     """
     Manages streaming with visualization.
@@ -1158,7 +1663,12 @@ class VisualStreamer:
         self.commands = None  # Preprocessed commands for visualization
         self.loop_index = None  # Loop point in commands
         self.loop_count = None  # Looping: None=no loop, 0=infinite, N=N times
-        self.start_time = None  # When playback started (shared between threads)
+        self.cmd_wait_samples = None  # Samples each command waits (int64 array)
+        self.cmd_sample_times = None  # Start sample of each command (int64 array)
+        self.total_samples = 0  # Total samples in one pass through commands
+        self.loop_start_samples = 0  # Sample time of the loop point
+        self.start_time_ns = None  # time.monotonic_ns() when playback started (shared between threads)
+        self.preprocessed = None  # Preprocessing results reused by the streaming thread
 
     def stream_with_visualization(self, port, baud, vgm_path, dac_rate=None,
                                    no_dac=False, loop_count=None, crt_enabled=True,
@@ -1175,7 +1685,7 @@ class VisualStreamer:
         self.interceptor = CommandInterceptor()
 
         # Connect interceptor callbacks to visualizer
-        self.interceptor.on_waveform_update = self.app.update_waveform
+        self.interceptor.on_waveform_batch = self.app.update_waveforms
         self.interceptor.on_key_change = self.app.set_key_on
         self.interceptor.on_dac_mode_change = self.app.set_dac_mode
         self.interceptor.on_pitch_change = self.app.set_channel_pitch
@@ -1211,14 +1721,22 @@ class VisualStreamer:
                 self.streaming_thread.join(timeout=2.0)
             if self.viz_thread and self.viz_thread.is_alive():
                 self.viz_thread.join(timeout=2.0)
+            self._release_preprocessed()
 
         return self.stream_result if self.stream_result is not None else False
 
+    def _release_preprocessed(self):
+        """Drop the loaded file so its mapping doesn't keep it locked (Windows)."""
+        preprocessed, self.preprocessed = self.preprocessed, None
+        if preprocessed and isinstance(preprocessed['data'], mmap.mmap):
+            try:
+                preprocessed['data'].close()
+            except BufferError:
+                pass  # Still exported somewhere; freed with its last view
+
     def _preprocess_for_viz(self, vgm_path, dac_rate, no_dac):
         """Preprocess VGM for visualization - same processing as streaming."""
-        with open(vgm_path, 'rb') as f:
-            data = f.read()
-        data = decompress_vgz(data)
+        data, file_size = load_vgm(vgm_path)
         header = parse_vgm_header(data)
         if not header:
             return
@@ -1226,26 +1744,44 @@ class VisualStreamer:
         self.total_duration = header['duration']
 
         # Preprocess same as streaming
-        commands, loop_index = preprocess_vgm(data, header['data_offset'], header['loop_offset'])
+        raw_commands, raw_loop_index = preprocess_vgm(data, header['data_offset'], header['loop_offset'])
+        commands, loop_index = raw_commands, raw_loop_index
 
         # Detect chips and apply PSG attenuation (same as streaming)
         has_psg, has_ym2612 = detect_chips(commands)
-        if has_psg and has_ym2612:
-            commands, loop_index = attenuate_psg(commands, attenuation_increase=2, loop_index=loop_index)
+        psg_attenuation = 2 if has_psg and has_ym2612 else 0
 
-        # Apply same DAC processing as streaming would
+        # Apply same DAC processing and wait optimization as streaming would
         # Note: We don't know board type here, so use provided dac_rate or assume 1
-        if no_dac:
-            commands, loop_index = strip_dac(commands, loop_index)
-        elif dac_rate and dac_rate > 1:
-            commands, loop_index = apply_dac_rate_reduction(commands, dac_rate, loop_index)
-
-        # Apply same wait optimization
-        commands, loop_index = apply_wait_optimization(commands, loop_index)
+        commands, loop_index = build_stream(commands, loop_index, psg_attenuation=psg_attenuation,
+                                            no_dac=no_dac, dac_rate=dac_rate or 1)
 
         self.commands = commands
         self.loop_index = loop_index
 
+        # Hand the work to the streaming thread so it doesn't redo it; the
+        # built stream is only reused if the board ends up with this DAC rate
+        self.preprocessed = {
+            'data': data,
+            'file_size': file_size,
+            'header': header,
+            'commands': raw_commands,
+            'loop_index': raw_loop_index,
+            'no_dac': no_dac,
+            'dac_rate': dac_rate or 1,
+            'stream': (commands, loop_index),
+        }
+
+        # Sample timeline shared with the viz thread
+        self.cmd_wait_samples = command_wait_samples(commands)
+        self.cmd_sample_times, self.total_samples = command_sample_times(
+            commands, self.cmd_wait_samples)
+        loop_start_idx = loop_index if loop_index is not None else 0
+        if loop_start_idx < len(self.cmd_sample_times):
+            self.loop_start_samples = int(self.cmd_sample_times[loop_start_idx])
+        else:
+            self.loop_start_samples = 0
+
     def _stream_thread(self, port, baud, vgm_path, dac_rate, no_dac, loop_count):
         """Background streaming thread."""
         try:
@@ -1255,7 +1791,8 @@ class VisualStreamer:
                 progress_callback=self._on_progress,
                 status_callback=self._on_status,
                 stop_event=self.stop_event,
-                start_callback=self._on_stream_start
+                start_callback=self._on_stream_start,
+                preprocessed=self.preprocessed
             )
         except Exception as e:
             print(f"Streaming error: {e}")
@@ -1265,8 +1802,8 @@ class VisualStreamer:
         """Called when hardware streaming actually starts - launch visualization."""
         # Start time for wall-clock sync. The 25ms catch-up mechanism handles
         # any drift from hardware buffering or CPU overhead.
-        self.start_time = time.time()
-        # Then start viz thread which will use this start_time
+        self.start_time_ns = time.monotonic_ns()
+        # Then start viz thread which will use this start time
         self.viz_thread = threading.Thread(target=self._viz_thread_run, daemon=True)
         self.viz_thread.start()
 
@@ -1275,7 +1812,8 @@ class VisualStreamer:
         Visualization thread - processes commands at real-time rate.
 
         Uses the SAME preprocessed commands as streaming.
-        Timing is based on wall-clock from shared start_time.
+        Timing is based on the monotonic clock from shared start_time_ns,
+        kept in integer nanoseconds/samples so long plays don't drift.
         If behind, skips commands (not just waits) to truly catch up.
         """
         if not self.commands:
@@ -1289,114 +1827,114 @@ class VisualStreamer:
         plays_remaining = -1 if self.loop_count == 0 else (self.loop_count or 1)
         loop_start_idx = self.loop_index if self.loop_index is not None else 0
 
-        # Pre-calculate cumulative sample times for each command for fast seeking
-        cmd_sample_times = []
-        cumulative = 0
-        for cmd, args in self.commands:
-            cmd_sample_times.append(cumulative)
-            if cmd == CMD_WAIT_NTSC:
-                cumulative += FRAME_SAMPLES_NTSC
-            elif cmd == CMD_WAIT_PAL:
-                cumulative += FRAME_SAMPLES_PAL
-            elif cmd == CMD_WAIT_FRAMES and len(args) >= 2:
-                cumulative += args[0] | (args[1] << 8)
-            elif 0x70 <= cmd <= 0x7F:
-                cumulative += (cmd & 0x0F) + 1
-            elif 0x80 <= cmd <= 0x8F:
-                cumulative += cmd & 0x0F
-            elif cmd == CMD_RLE_WAIT_FRAME_1 and args:
-                cumulative += args[0] * FRAME_SAMPLES_NTSC
-        total_samples = cumulative
-        loop_start_samples = cmd_sample_times[loop_start_idx] if loop_start_idx < len(cmd_sample_times) else 0
-
-        def find_cmd_for_time(target_samples):
-            """Binary search to find command index for a given sample time."""
-            lo, hi = 0, len(cmd_sample_times) - 1
-            while lo < hi:
-                mid = (lo + hi + 1) // 2
-                if cmd_sample_times[mid] <= target_samples:
-                    lo = mid
-                else:
-                    hi = mid - 1
-            return lo
-
-        # Use a local time reference that resets on loop
-        loop_time_offset = 0.0  # Added to start_time for current loop iteration
+        # Sample timing was computed once during preprocessing; a plain list
+        # is fastest for per-command lookups from Python
+        loop_start_samples = self.loop_start_samples
+        wait_table = self.cmd_wait_samples.tolist()
+
+        # Commands as a flat list + byte blob (args of command i are
+        # blob[offsets[i] + 1:offsets[i + 1]])
+        cmd_table, blob, offsets = self.commands.packed()
+
+        # Commands are handled in runs that end at the next command which
+        # waits (or ends the stream); only that command needs clock sync, so
+        # the register writes before it are dispatched back to back.
+        # run_ends[i] = index just past the run starting at command i.
+        num_commands = len(self.commands)
+        sync_points = np.flatnonzero((self.cmd_wait_samples > 0) |
+                                     (self.commands.cmds == CMD_END_OF_STREAM))
+        next_sync = np.searchsorted(sync_points, np.arange(num_commands))
+        run_ends = np.full(num_commands, num_commands, dtype=np.int64)
+        has_sync = next_sync < len(sync_points)
+        run_ends[has_sync] = sync_points[next_sync[has_sync]] + 1
+        run_ends = run_ends.tolist()
+
+        SAMPLE_RATE = 44100
+        NS_PER_SECOND = 1_000_000_000
+
+        # Monotonic time (ns) at which sample 0 plays; moved on each loop
+        origin_ns = self.start_time_ns
+
+        # The clock is read once per run (after its sync command) and reused
+        # for the next run's drift check
+        now_ns = time.monotonic_ns()
 
         def do_loop():
             """Handle loop - reset to loop point and adjust time reference."""
-            nonlocal cmd_idx, samples_processed, loop_time_offset
-            # Calculate how far into the song we should be at loop point
-            loop_point_time = loop_start_samples / 44100.0
-            # Current wall time
-            now = time.time()
-            # Adjust offset so (now - start_time - loop_time_offset) = loop_point_time
-            loop_time_offset = (now - self.start_time) - loop_point_time
+            nonlocal cmd_idx, samples_processed, origin_ns, now_ns
+            # Re-anchor the time base so the loop point plays now
+            now_ns = time.monotonic_ns()
+            origin_ns = now_ns - loop_start_samples * NS_PER_SECOND // SAMPLE_RATE
             cmd_idx = loop_start_idx
             samples_processed = loop_start_samples
 
+        def handle_end():
+            """End of the commands reached - returns True if playback loops."""
+            nonlocal plays_remaining
+            if not is_looping:
+                return False
+            if plays_remaining != -1:  # -1 = infinite
+                if plays_remaining <= 1:
+                    return False
+                plays_remaining -= 1
+            do_loop()
+            return True
+
         while not self.stop_event.is_set():
             # Check if we've reached the end of commands
-            if cmd_idx >= len(self.commands):
-                if is_looping:
-                    if plays_remaining == -1:
-                        do_loop()
-                        continue
-                    elif plays_remaining > 1:
-                        plays_remaining -= 1
-                        do_loop()
-                        continue
-                break
+            if cmd_idx >= num_commands:
+                if not handle_end():
+                    break
+                continue
+
+            # Register writes leading up to this run's sync point
+            run_end = run_ends[cmd_idx]
+            process_command = self.interceptor.process_command
+            for i in range(cmd_idx, run_end - 1):
+                process_command(cmd_table[i], blob[offsets[i] + 1:offsets[i + 1]])
+            cmd_idx = run_end - 1
 
             # Bidirectional sync: skip ahead if behind, wait if ahead
-            now = time.time()
-            elapsed = now - self.start_time - loop_time_offset
-            target_samples = int(elapsed * 44100.0)
+            target_samples = (now_ns - origin_ns) * SAMPLE_RATE // NS_PER_SECOND
             drift_samples = target_samples - samples_processed
 
-            # If behind, fast-forward by processing commands without sleeping
-            # (don't skip - we need to process through interceptor for emulator state)
+            # If behind, fast-forward without sleeping
             catching_up = drift_samples > 441  # More than 10ms behind
 
-            cmd, args = self.commands[cmd_idx]
+            if catching_up:
+                # Jump straight to where playback is, replaying only the final
+                # register state of the skipped commands
+                skip_to = command_index_at(self.cmd_sample_times, target_samples)
+                if skip_to > cmd_idx + 1:
+                    for cmd, args in _coalesce_writes(cmd_table, blob, offsets, cmd_idx, skip_to):
+                        process_command(cmd, args)
+                    cmd_idx = skip_to
+                    samples_processed = int(self.cmd_sample_times[skip_to])
+                    continue
+
+            cmd = cmd_table[cmd_idx]
+            args = blob[offsets[cmd_idx] + 1:offsets[cmd_idx + 1]]
+            wait_samples = wait_table[cmd_idx]
             cmd_idx += 1
 
             # Process command through interceptor
             self.interceptor.process_command(cmd, args)
 
-            # Calculate wait samples for this command
-            wait_samples = 0
-            if cmd == CMD_WAIT_NTSC:
-                wait_samples = FRAME_SAMPLES_NTSC
-            elif cmd == CMD_WAIT_PAL:
-                wait_samples = FRAME_SAMPLES_PAL
-            elif cmd == CMD_WAIT_FRAMES and len(args) >= 2:
-                wait_samples = args[0] | (args[1] << 8)
-            elif 0x70 <= cmd <= 0x7F:
-                wait_samples = (cmd & 0x0F) + 1
-            elif 0x80 <= cmd <= 0x8F:
-                wait_samples = cmd & 0x0F
-            elif cmd == CMD_RLE_WAIT_FRAME_1 and args:
-                wait_samples = args[0] * FRAME_SAMPLES_NTSC
-            elif cmd == CMD_END_OF_STREAM:
-                if is_looping:
-                    if plays_remaining == -1:
-                        do_loop()
-                        continue
-                    elif plays_remaining > 1:
-                        plays_remaining -= 1
-                        do_loop()
-                        continue
-                break
+            if cmd == CMD_END_OF_STREAM:
+                if not handle_end():
+                    break
+                continue
 
             if wait_samples > 0:
                 samples_processed += wait_samples
-                # Skip sleep if catching up, otherwise sync to wall clock
+                now_ns = time.monotonic_ns()
+                # Skip sleep if catching up, otherwise sync to the clock
+                # (waiting on stop_event so a stop request ends the sleep)
                 if not catching_up:
-                    target_time = self.start_time + loop_time_offset + (samples_processed / 44100.0)
-                    now = time.time()
-                    if now < target_time:
-                        time.sleep(target_time - now)
+                    target_ns = origin_ns + samples_processed * NS_PER_SECOND // SAMPLE_RATE
+                    if now_ns < target_ns:
+                        self.stop_event.wait((target_ns - now_ns) / NS_PER_SECOND)
+                        now_ns = target_ns
 
     def _on_progress(self, progress: float, elapsed: float, total: float):
         """Called to update progress."""
@@ -1413,12 +1951,14 @@ class VisualStreamer:
 def stream_vgm_visual_internal(port, baud, vgm_path, dac_rate=None, no_dac=False,
                                loop_count=None, chunk_callback=None,
                                progress_callback=None, status_callback=None,
-                               stop_event=None, start_callback=None):
+                               stop_event=None, start_callback=None, preprocessed=None):
     """
     Stream VGM file with callbacks for visualization.
 
     This is the same as stream_vgm but with hooks for the visualizer.
     chunk_callback receives raw chunk data for async processing (doesn't block streaming).
+    preprocessed is VisualStreamer.preprocessed; when given, the file isn't
+    loaded or preprocessed again.
     """
 
     def update_status(msg):
@@ -1426,21 +1966,20 @@ def stream_vgm_visual_internal(port, baud, vgm_path, dac_rate=None, no_dac=False
             status_callback(msg)
         print(msg)
 
-    # Load file
-    update_status(f"Loading: {os.path.basename(vgm_path)}")
-    with open(vgm_path, 'rb') as f:
-        data = f.read()
-
-    original_size = len(data)
-    data = decompress_vgz(data)
+    if preprocessed:
+        data, original_size = preprocessed['data'], preprocessed['file_size']
+        header = preprocessed['header']
+    else:
+        # Load file
+        update_status(f"Loading: {os.path.basename(vgm_path)}")
+        data, original_size = load_vgm(vgm_path)
+        header = parse_vgm_header(data)
+        if not header:
+            update_status("ERROR: Not a valid VGM file!")
+            return False
     if len(data) != original_size:
         update_status(f"Decompressed: {original_size:,} -> {len(data):,} bytes")
 
-    header = parse_vgm_header(data)
-    if not header:
-        update_status("ERROR: Not a valid VGM file!")
-        return False
-
     total_duration = header['duration']
     update_status(f"Duration: {int(total_duration//60)}:{int(total_duration%60):02d}")
 
@@ -1448,10 +1987,13 @@ def stream_vgm_visual_internal(port, baud, vgm_path, dac_rate=None, no_dac=False
     has_vgm_loop = header['loop_offset'] > 0
 
     # Preprocess VGM
-    update_status("Preprocessing VGM...")
-    commands, loop_index = preprocess_vgm(data, header['data_offset'], header['loop_offset'])
+    if preprocessed:
+        commands, loop_index = preprocessed['commands'], preprocessed['loop_index']
+    else:
+        update_status("Preprocessing VGM...")
+        commands, loop_index = preprocess_vgm(data, header['data_offset'], header['loop_offset'])
     original_cmd_count = len(commands)
-    original_bytes = sum(1 + len(args) for cmd, args in commands)
+    original_bytes = commands.num_bytes()
 
     # Connect
     update_status(f"Connecting to {port} at {baud} baud...")
@@ -1478,21 +2020,24 @@ def stream_vgm_visual_internal(port, baud, vgm_path, dac_rate=None, no_dac=False
             update_status(f"Retry {attempt}...")
 
         ser.reset_input_buffer()
-        ser.write(bytes([CMD_PING]))
+        ser.write(_BYTE1[CMD_PING])
 
         got_ack = False
         timeout = time.time()
         while time.time() - timeout < 1.0:
-            if ser.in_waiting:
-                b = ser.read(1)[0]
-                if b == CMD_ACK:
-                    got_ack = True
-                elif got_ack and board_type is None and b in BOARD_SETTINGS:
-                    board_type = b
-                elif b == FLOW_READY and got_ack and board_type is not None:
-                    got_ready = True
-                    board_name = {1: "Uno", 2: "Mega", 3: "Other", 4: "Teensy 4.x", 5: "ESP32"}.get(board_type, "Unknown")
-                    update_status(f"Connected! (Board: {board_name})")
+            waiting = ser.in_waiting
+            if waiting:
+                for b in ser.read(waiting):
+                    if b == CMD_ACK:
+                        got_ack = True
+                    elif got_ack and board_type is None and b in BOARD_SETTINGS:
+                        board_type = b
+                    elif b == FLOW_READY and got_ack and board_type is not None:
+                        got_ready = True
+                        board_name = {1: "Uno", 2: "Mega", 3: "Other", 4: "Teensy 4.x", 5: "ESP32"}.get(board_type, "Unknown")
+                        update_status(f"Connected! (Board: {board_name})")
+                        break
+                if got_ready:
                     break
             time.sleep(0.01)
 
@@ -1506,21 +2051,19 @@ def stream_vgm_visual_internal(port, baud, vgm_path, dac_rate=None, no_dac=False
 
     # Get board-specific settings
     chunk_size, chunks_in_flight, default_dac_rate = BOARD_SETTINGS.get(board_type, (64, 2, 1))
-
-    # Detect chips and apply PSG attenuation if both FM and PSG are present
-    has_psg, has_ym2612 = detect_chips(commands)
-    if has_psg and has_ym2612:
-        commands, loop_index = attenuate_psg(commands, attenuation_increase=2, loop_index=loop_index)
-
-    # Apply DAC processing
     effective_dac_rate = dac_rate if dac_rate is not None else default_dac_rate
-    if no_dac:
-        commands, loop_index = strip_dac(commands, loop_index)
-    elif effective_dac_rate > 1:
-        commands, loop_index = apply_dac_rate_reduction(commands, effective_dac_rate, loop_index)
 
-    # Apply wait optimization
-    commands, loop_index = apply_wait_optimization(commands, loop_index)
+    if (preprocessed and preprocessed['no_dac'] == no_dac
+            and preprocessed['dac_rate'] == effective_dac_rate):
+        commands, loop_index = preprocessed['stream']
+    else:
+        # Detect chips and apply PSG attenuation if both FM and PSG are present
+        has_psg, has_ym2612 = detect_chips(commands)
+        psg_attenuation = 2 if has_psg and has_ym2612 else 0
+
+        # Apply attenuation, DAC processing and wait optimization
+        commands, loop_index = build_stream(commands, loop_index, psg_attenuation=psg_attenuation,
+                                            no_dac=no_dac, dac_rate=effective_dac_rate)
 
     # Convert to bytes
     stream_data, loop_byte_offset, byte_to_samples = commands_to_bytes(commands, loop_index)
@@ -1541,31 +2084,36 @@ def stream_vgm_visual_internal(port, baud, vgm_path, dac_rate=None, no_dac=False
     pending_chunks = []
     chunks_sent = 0
 
-    def send_chunk(data):
-        """Send chunk to hardware and queue for visualization (non-blocking)."""
-        nonlocal chunks_sent
-        chunks_sent += 1
-        length = len(data)
-        checksum = length
-        for b in data:
-            checksum ^= b
-        packet = bytes([CHUNK_HEADER, length]) + data + bytes([checksum & 0xFF])
-        ser.write(packet)
+    # Reused buffer holding the packets of one in-flight window
+    batch = bytearray(chunks_in_flight * (chunk_size + 3))
+    batch_view = memoryview(batch)
 
-        # Queue chunk for async visualization processing (doesn't block streaming)
-        if chunk_callback:
-            chunk_callback(bytes(data))
+    def send_chunks(spans):
+        """Send the chunks for (start, end) spans in a single serial write."""
+        nonlocal chunks_sent
+        n = 0
+        for s_pos, e_pos in spans:
+            chunks_sent += 1
+            data = current_data[s_pos:e_pos]
+            length = e_pos - s_pos
+            batch[n] = CHUNK_HEADER
+            batch[n + 1] = length
+            batch_view[n + 2:n + 2 + length] = data
+            batch[n + 2 + length] = current_checksums[s_pos // chunk_size]
+            n += length + 3
+
+            # Queue chunk for async visualization processing (doesn't block streaming)
+            if chunk_callback:
+                chunk_callback(bytes(data))
+
+        ser.write(batch_view[:n])
 
     def check_responses():
-        acks = 0
-        naks = 0
-        while ser.in_waiting:
-            b = ser.read(1)[0]
-            if b == FLOW_READY:
-                acks += 1
-            elif b == FLOW_NAK:
-                naks += 1
-        return acks, naks
+        waiting = ser.in_waiting
+        if not waiting:
+            return 0, 0
+        received = ser.read(waiting)
+        return received.count(FLOW_READY), received.count(FLOW_NAK)
 
     def wait_for_response(timeout_val=0.5):
         start = time.time()
@@ -1586,21 +2134,27 @@ def stream_vgm_visual_internal(port, baud, vgm_path, dac_rate=None, no_dac=False
         if loop_count is not None:
             plays_remaining = -1 if loop_count == 0 else loop_count
 
+        # Slice through a memoryview so chunks and loop sections don't copy
+        stream_view = memoryview(stream_data)
         if is_looping:
             if stream_data and stream_data[-1] == CMD_END_OF_STREAM:
-                stream_data_main = stream_data[:-1]
+                stream_data_main = stream_view[:-1]
             else:
-                stream_data_main = stream_data
+                stream_data_main = stream_view
             loop_start = loop_byte_offset if loop_byte_offset else 0
             stream_data_loop = stream_data_main[loop_start:]
+            loop_checksums = chunk_checksums(stream_data_loop, chunk_size)
         else:
-            stream_data_main = stream_data
+            stream_data_main = stream_view
+        main_checksums = chunk_checksums(stream_data_main, chunk_size)
 
         pos = 0
         total_bytes_streamed = 0
         loop_number = 1
         pending_chunks = []
+        in_flight_bytes = 0  # Total size of pending_chunks
         current_data = stream_data_main
+        current_checksums = main_checksums
 
         while True:
             # Check for stop signal
@@ -1608,13 +2162,16 @@ def stream_vgm_visual_internal(port, baud, vgm_path, dac_rate=None, no_dac=False
                 update_status("Stopped by user")
                 break
 
-            # Send chunks
+            # Send chunks (the whole in-flight window in one write)
+            new_chunks = []
             while len(pending_chunks) < chunks_in_flight and pos < len(current_data):
                 chunk_end = min(pos + chunk_size, len(current_data))
-                chunk_data = current_data[pos:chunk_end]
-                send_chunk(chunk_data)
+                new_chunks.append((pos, chunk_end))
                 pending_chunks.append((pos, chunk_end))
+                in_flight_bytes += chunk_end - pos
                 pos = chunk_end
+            if new_chunks:
+                send_chunks(new_chunks)
 
             # Check for responses
             acks, naks = check_responses()
@@ -1623,11 +2180,12 @@ def stream_vgm_visual_internal(port, baud, vgm_path, dac_rate=None, no_dac=False
                 retransmits += naks
                 chunks_to_resend = pending_chunks[:naks]
                 pending_chunks = pending_chunks[naks:]
-                for s_pos, e_pos in chunks_to_resend:
-                    send_chunk(current_data[s_pos:e_pos])
-                    pending_chunks.append((s_pos, e_pos))
+                send_chunks(chunks_to_resend)
+                pending_chunks.extend(chunks_to_resend)
 
             if acks > 0:
+                for s_pos, e_pos in pending_chunks[:acks]:
+                    in_flight_bytes -= e_pos - s_pos
                 pending_chunks = pending_chunks[acks:]
 
             if pending_chunks and len(pending_chunks) >= chunks_in_flight:
@@ -1636,14 +2194,15 @@ def stream_vgm_visual_internal(port, baud, vgm_path, dac_rate=None, no_dac=False
                     retransmits += naks
                     chunks_to_resend = pending_chunks[:naks]
                     pending_chunks = pending_chunks[naks:]
-                    for s_pos, e_pos in chunks_to_resend:
-                        send_chunk(current_data[s_pos:e_pos])
-                        pending_chunks.append((s_pos, e_pos))
+                    send_chunks(chunks_to_resend)
+                    pending_chunks.extend(chunks_to_resend)
                 if acks > 0:
+                    for s_pos, e_pos in pending_chunks[:acks]:
+                        in_flight_bytes -= e_pos - s_pos
                     pending_chunks = pending_chunks[acks:]
 
             # Progress update
-            confirmed_pos = pos - sum(end - start for start, end in pending_chunks)
+            confirmed_pos = pos - in_flight_bytes
             progress = confirmed_pos * 100 // len(current_data) if len(current_data) > 0 else 100
             if progress != last_progress:
                 last_progress = progress
@@ -1660,7 +2219,7 @@ def stream_vgm_visual_internal(port, baud, vgm_path, dac_rate=None, no_dac=False
                         plays_remaining -= 1
                     else:
                         if not pending_chunks:
-                            ser.write(bytes([CMD_END_OF_STREAM]))
+                            ser.write(_BYTE1[CMD_END_OF_STREAM])
                             total_bytes_streamed += len(current_data)
                             break
                         continue
@@ -1673,12 +2232,13 @@ def stream_vgm_visual_internal(port, baud, vgm_path, dac_rate=None, no_dac=False
                     pos = 0
                     last_progress = -1
                     current_data = stream_data_loop
+                    current_checksums = loop_checksums
                     update_status(f"Loop {loop_number}...")
                 else:
                     total_bytes_streamed += len(current_data)
                     break
 
-        ser.write(bytes([CHUNK_END]))
+        ser.write(_BYTE1[CHUNK_END])
         wait_for_response(1.0)
 
         update_status("Playback complete!")
@@ -1688,10 +2248,9 @@ def stream_vgm_visual_internal(port, baud, vgm_path, dac_rate=None, no_dac=False
         while time.time() - end_wait_start < 600:
             if stop_event and stop_event.is_set():
                 break
-            if ser.in_waiting:
-                b = ser.read(1)[0]
-                if b == FLOW_READY:
-                    break
+            waiting = ser.in_waiting
+            if waiting and FLOW_READY in ser.read(waiting):
+                break
             time.sleep(0.05)
 
         ser.close()
@@ -1742,10 +2301,7 @@ def run_offline_recording(vgm_path, record_file, loop_count=None, crt_enabled=Tr
 
     # Load and parse VGM
     print(f"Loading: {os.path.basename(vgm_path)}")
-    with open(vgm_path, 'rb') as f:
-        data = f.read()
-
-    data = decompress_vgz(data)
+    data, _ = load_vgm(vgm_path)
     header = parse_vgm_header(data)
     if not header:
         print("ERROR: Not a valid VGM file!")
@@ -1767,7 +2323,7 @@ def run_offline_recording(vgm_path, record_file, loop_count=None, crt_enabled=Tr
     interceptor = CommandInterceptor()
 
     # Connect callbacks
-    interceptor.on_waveform_update = app.update_waveform
+    interceptor.on_waveform_batch = app.update_waveforms
     interceptor.on_key_change = app.set_key_on
     interceptor.on_dac_mode_change = app.set_dac_mode
     interceptor.on_pitch_change = app.set_channel_pitch
@@ -1846,29 +2402,19 @@ def run_offline_recording(vgm_path, record_file, loop_count=None, crt_enabled=Tr
 
     old_handler = signal.signal(signal.SIGINT, signal_handler)
 
+    # Samples each command waits, decoded for the whole stream up front
+    wait_table = command_wait_samples(commands).tolist()
+
     try:
         while cmd_idx < len(commands) and not user_cancelled:
             cmd, args = commands[cmd_idx]
+            wait_samples = wait_table[cmd_idx]
             cmd_idx += 1
 
             # Process command
             interceptor.process_command(cmd, args)
 
-            # Calculate samples for this command
-            wait_samples = 0
-            if cmd == CMD_WAIT_NTSC:
-                wait_samples = FRAME_SAMPLES_NTSC
-            elif cmd == CMD_WAIT_PAL:
-                wait_samples = FRAME_SAMPLES_PAL
-            elif cmd == CMD_WAIT_FRAMES and len(args) >= 2:
-                wait_samples = args[0] | (args[1] << 8)
-            elif 0x70 <= cmd <= 0x7F:
-                wait_samples = (cmd & 0x0F) + 1
-            elif 0x80 <= cmd <= 0x8F:
-                wait_samples = cmd & 0x0F
-            elif cmd == CMD_RLE_WAIT_FRAME_1 and args:
-                wait_samples = args[0] * FRAME_SAMPLES_NTSC
-            elif cmd == CMD_END_OF_STREAM:
+            if cmd == CMD_END_OF_STREAM:
                 if loop_count is not None and loop_index is not None:
                     loops_completed += 1
                     if loop_count == 0 or loops_completed < loop_count:
@@ -1957,261 +2503,240 @@ def run_offline_visualizer(vgm_path, loop_count=None, crt_enabled=True, audio_en
         print("ERROR: Visualization not available. Install imgui-bundle.")
         return False
 
-    # Set up audio if requested
-    audio_stream = None
-    audio_buffer = None
-    audio_lock = None
-    audio_output_latency = 0  # Will be set from stream.latency if audio enabled
-    if audio_enabled:
-        try:
-            import sounddevice as sd
-            import numpy as np
-
-            # Ring buffer for audio samples
-            audio_buffer = {'data': np.zeros((44100, 2), dtype=np.float32), 'write_pos': 0, 'read_pos': 0}
-            audio_lock = threading.Lock()
-
-            def audio_callback(outdata, frames, time_info, status):
-                """Sounddevice callback - pulls audio from ring buffer."""
-                with audio_lock:
-                    buf = audio_buffer['data']
-                    read_pos = audio_buffer['read_pos']
-                    write_pos = audio_buffer['write_pos']
-                    buf_len = len(buf)
-
-                    # Calculate available samples
-                    available = (write_pos - read_pos) % buf_len
-
-                    if available >= frames:
-                        # Read from ring buffer (fast path - no wrap)
-                        end_pos = read_pos + frames
-                        if end_pos <= buf_len:
-                            outdata[:] = buf[read_pos:end_pos]
-                        else:
-                            # Wrap around
-                            first_chunk = buf_len - read_pos
-                            outdata[:first_chunk] = buf[read_pos:]
-                            outdata[first_chunk:] = buf[:frames - first_chunk]
-                        audio_buffer['read_pos'] = end_pos % buf_len
-                    else:
-                        # Not enough data - output silence
-                        outdata.fill(0)
-
-            audio_stream = sd.OutputStream(
-                samplerate=44100,
-                channels=2,
-                dtype='float32',
-                blocksize=1024,
-                callback=audio_callback
-            )
-            audio_stream.start()
-            # Get actual output latency reported by the audio system
-            audio_output_latency = audio_stream.latency  # in seconds
-            print(f"Audio output enabled (latency: {audio_output_latency*1000:.0f}ms)")
-        except ImportError:
-            print("WARNING: sounddevice not installed. Run: pip install sounddevice")
-            print("Continuing without audio...")
-            audio_enabled = False
-        except Exception as e:
-            print(f"WARNING: Could not initialize audio: {e}")
-            print("Continuing without audio...")
-            audio_enabled = False
+    with contextlib.ExitStack() as resources:
+        # Set up audio if requested
+        audio_ring = None
+        audio_output_latency = 0  # Will be set from stream.latency if audio enabled
+        if audio_enabled:
+            try:
+                import sounddevice as sd
+
+                # Ring buffer for audio samples, filled by the interceptor on
+                # each flush (mirror >= largest callback block)
+                audio_ring = AudioRing(size=44100, mirror=4096)
+
+                def audio_callback(outdata, frames, time_info, status):
+                    """Sounddevice callback - pulls audio from ring buffer."""
+                    # Outputs silence if not enough data is buffered
+                    audio_ring.read_into(outdata)
+
+                # Started now, stopped and closed when the function exits
+                audio_stream = resources.enter_context(sd.OutputStream(
+                    samplerate=44100,
+                    channels=2,
+                    dtype='float32',
+                    blocksize=1024,
+                    callback=audio_callback
+                ))
+                # Get actual output latency reported by the audio system
+                audio_output_latency = audio_stream.latency  # in seconds
+                print(f"Audio output enabled (latency: {audio_output_latency*1000:.0f}ms)")
+            except ImportError:
+                print("WARNING: sounddevice not installed. Run: pip install sounddevice")
+                print("Continuing without audio...")
+                audio_enabled = False
+            except Exception as e:
+                print(f"WARNING: Could not initialize audio: {e}")
+                print("Continuing without audio...")
+                audio_enabled = False
+
+        # Load and parse VGM
+        print(f"Loading: {os.path.basename(vgm_path)}")
+        data, _ = load_vgm(vgm_path)
+        header = parse_vgm_header(data)
+        if not header:
+            print("ERROR: Not a valid VGM file!")
+            return False
 
-    # Load and parse VGM
-    print(f"Loading: {os.path.basename(vgm_path)}")
-    with open(vgm_path, 'rb') as f:
-        data = f.read()
+        total_duration = header['duration']
+        print(f"Duration: {int(total_duration//60)}:{int(total_duration%60):02d}")
 
-    data = decompress_vgz(data)
-    header = parse_vgm_header(data)
-    if not header:
-        print("ERROR: Not a valid VGM file!")
-        return False
+        # Preprocess
+        commands, loop_index = preprocess_vgm(data, header['data_offset'], header['loop_offset'])
+        print(f"Commands: {len(commands)}")
+
+        # Create visualizer and interceptor
+        app = VisualizerApp(crt_enabled=crt_enabled)
+        interceptor = CommandInterceptor()
+
+        # Audio buffer latency compensation
+        # The audio ring buffer introduces latency, so we delay visualization to match
+        if audio_enabled:
+            # Total latency = our ring buffer fill time + audio system reported latency
+            AUDIO_SAMPLERATE = 44100
+            AUDIO_BLOCKSIZE = 1024  # Samples per audio callback
+            RING_BUFFER_BLOCKS = 2  # Blocks we buffer before audio callback has data
+            ring_buffer_latency = (AUDIO_BLOCKSIZE * RING_BUFFER_BLOCKS) / AUDIO_SAMPLERATE
+            # audio_output_latency is set when stream starts (includes driver + OS + hardware)
+            AUDIO_LATENCY_SECONDS = ring_buffer_latency + audio_output_latency
+
+            # FIFO of (timestamp, callback, args). The interceptor calls these
+            # callbacks synchronously from process_command(), so the queue is
+            # filled and drained by the playback thread alone and needs no lock.
+            viz_delay_queue = deque()
+            # Delivery time of the queue head (inf when empty); lets the playback
+            # thread skip the queue entirely while nothing is due
+            next_deliver_time = math.inf
+
+            def queue_delayed(update_type, args):
+                """Queue an update to be delivered after the audio latency delay."""
+                nonlocal next_deliver_time
+                deliver_time = time.perf_counter() + AUDIO_LATENCY_SECONDS
+                viz_delay_queue.append((deliver_time, update_type, args))
+                next_deliver_time = min(next_deliver_time, deliver_time)
+
+            # Waveform snapshots are copied into a per-channel ring of preallocated
+            # buffers instead of allocating a new array per update. The ring is
+            # sized to cover the updates in flight during AUDIO_LATENCY_SECONDS;
+            # if a burst ever exceeds it, fall back to a fresh copy. Snapshots are
+            # int16 to halve the copied bytes (the visualizer scales them back).
+            interceptor.viz_dtype = np.int16
+            max_in_flight = AUDIO_LATENCY_SECONDS * AUDIO_SAMPLERATE / CommandInterceptor.MIN_SAMPLES_FOR_UPDATE
+            waveform_pool_size = 1 << max(3, math.ceil(math.log2(max_in_flight + 2)))
+            waveform_pool = [
+                [np.empty(CommandInterceptor.MAX_SAMPLES_FOR_UPDATE, dtype=interceptor.viz_dtype)
+                 for _ in range(waveform_pool_size)]
+                for _ in range(app.TOTAL_CHANNELS)
+            ]
+            waveform_pool_mask = waveform_pool_size - 1
+            waveform_pool_idx = [0] * app.TOTAL_CHANNELS
+            waveform_in_flight = [0] * app.TOTAL_CHANNELS
+
+            def delayed_waveform_update(channel, data):
+                """Queue waveform update to be delivered after audio latency delay."""
+                n = len(data)
+                if waveform_in_flight[channel] < waveform_pool_size and n <= CommandInterceptor.MAX_SAMPLES_FOR_UPDATE:
+                    slot = waveform_pool[channel][waveform_pool_idx[channel] & waveform_pool_mask][:n]
+                    waveform_pool_idx[channel] += 1
+                    np.copyto(slot, data)
+                else:
+                    slot = data.copy()
+                waveform_in_flight[channel] += 1
+                queue_delayed('waveform', (channel, slot))
 
-    total_duration = header['duration']
-    print(f"Duration: {int(total_duration//60)}:{int(total_duration%60):02d}")
+            def delayed_key_change(channel, on):
+                queue_delayed('key', (channel, on))
 
-    # Preprocess
-    commands, loop_index = preprocess_vgm(data, header['data_offset'], header['loop_offset'])
-    print(f"Commands: {len(commands)}")
+            def delayed_dac_mode(enabled):
+                queue_delayed('dac', (enabled,))
 
-    # Create visualizer and interceptor
-    app = VisualizerApp(crt_enabled=crt_enabled)
-    interceptor = CommandInterceptor()
+            def delayed_pitch_change(channel, pitch):
+                queue_delayed('pitch', (channel, pitch))
 
-    # Audio buffer latency compensation
-    # The audio ring buffer introduces latency, so we delay visualization to match
-    if audio_enabled:
-        # Total latency = our ring buffer fill time + audio system reported latency
-        AUDIO_SAMPLERATE = 44100
-        AUDIO_BLOCKSIZE = 1024  # Samples per audio callback
-        RING_BUFFER_BLOCKS = 2  # Blocks we buffer before audio callback has data
-        ring_buffer_latency = (AUDIO_BLOCKSIZE * RING_BUFFER_BLOCKS) / AUDIO_SAMPLERATE
-        # audio_output_latency is set when stream starts (includes driver + OS + hardware)
-        AUDIO_LATENCY_SECONDS = ring_buffer_latency + audio_output_latency
-
-        viz_delay_queue = []  # Queue of (timestamp, callback, args)
-        viz_delay_lock = threading.Lock()
-
-        def delayed_waveform_update(channel, data):
-            """Queue waveform update to be delivered after audio latency delay."""
-            deliver_time = time.time() + AUDIO_LATENCY_SECONDS
-            with viz_delay_lock:
-                viz_delay_queue.append((deliver_time, 'waveform', (channel, data.copy())))
-
-        def delayed_key_change(channel, on):
-            deliver_time = time.time() + AUDIO_LATENCY_SECONDS
-            with viz_delay_lock:
-                viz_delay_queue.append((deliver_time, 'key', (channel, on)))
-
-        def delayed_dac_mode(enabled):
-            deliver_time = time.time() + AUDIO_LATENCY_SECONDS
-            with viz_delay_lock:
-                viz_delay_queue.append((deliver_time, 'dac', (enabled,)))
-
-        def delayed_pitch_change(channel, pitch):
-            deliver_time = time.time() + AUDIO_LATENCY_SECONDS
-            with viz_delay_lock:
-                viz_delay_queue.append((deliver_time, 'pitch', (channel, pitch)))
-
-        def process_delayed_updates():
-            """Process any delayed updates that are ready to be delivered."""
-            now = time.time()
-            with viz_delay_lock:
+            def process_delayed_updates():
+                """Process any delayed updates that are ready to be delivered."""
+                nonlocal next_deliver_time
+                now = time.perf_counter()
+                if now < next_deliver_time:
+                    return
                 while viz_delay_queue and viz_delay_queue[0][0] <= now:
-                    _, update_type, args = viz_delay_queue.pop(0)
+                    _, update_type, args = viz_delay_queue.popleft()
                     if update_type == 'waveform':
                         app.update_waveform(*args)
+                        waveform_in_flight[args[0]] -= 1
                     elif update_type == 'key':
                         app.set_key_on(*args)
                     elif update_type == 'dac':
                         app.set_dac_mode(*args)
                     elif update_type == 'pitch':
                         app.set_channel_pitch(*args)
+                next_deliver_time = viz_delay_queue[0][0] if viz_delay_queue else math.inf
 
-        interceptor.on_waveform_update = delayed_waveform_update
-        interceptor.on_key_change = delayed_key_change
-        interceptor.on_dac_mode_change = delayed_dac_mode
-        interceptor.on_pitch_change = delayed_pitch_change
-    else:
-        process_delayed_updates = None  # No delay needed without audio
-        interceptor.on_waveform_update = app.update_waveform
-        interceptor.on_key_change = app.set_key_on
-        interceptor.on_dac_mode_change = app.set_dac_mode
-        interceptor.on_pitch_change = app.set_channel_pitch
-
-    # Set up audio callback if enabled
-    if audio_enabled and audio_buffer is not None:
-        def on_audio(stereo_samples):
-            """Write stereo samples to ring buffer."""
-            import numpy as np
-
-            with audio_lock:
-                buf = audio_buffer['data']
-                write_pos = audio_buffer['write_pos']
-                buf_len = len(buf)
-                n = len(stereo_samples)
-
-                # Write samples to ring buffer (fast numpy slicing)
-                end_pos = write_pos + n
-                if end_pos <= buf_len:
-                    buf[write_pos:end_pos] = stereo_samples
-                else:
-                    # Wrap around
-                    first_chunk = buf_len - write_pos
-                    buf[write_pos:] = stereo_samples[:first_chunk]
-                    buf[:n - first_chunk] = stereo_samples[first_chunk:]
-                audio_buffer['write_pos'] = end_pos % buf_len
-        interceptor.on_audio_output = on_audio
+            interceptor.on_waveform_update = delayed_waveform_update
+            interceptor.on_key_change = delayed_key_change
+            interceptor.on_dac_mode_change = delayed_dac_mode
+            interceptor.on_pitch_change = delayed_pitch_change
+        else:
+            process_delayed_updates = None  # No delay needed without audio
+            interceptor.on_waveform_batch = app.update_waveforms
+            interceptor.on_key_change = app.set_key_on
+            interceptor.on_dac_mode_change = app.set_dac_mode
+            interceptor.on_pitch_change = app.set_channel_pitch
 
-    filename = os.path.basename(vgm_path)
-    app.set_playback_info(
-        filename,
-        total_duration,
-        title=header.get('title', ''),
-        composer=header.get('composer', ''),
-        game=header.get('game', '')
-    )
-    app.set_status("Offline playback" + (" with audio" if audio_enabled else ""))
+        # Audio goes straight from the interceptor into the ring buffer
+        if audio_enabled and audio_ring is not None:
+            interceptor.audio_ring = audio_ring
 
-    interceptor.start()
+        filename = os.path.basename(vgm_path)
+        app.set_playback_info(
+            filename,
+            total_duration,
+            title=header.get('title', ''),
+            composer=header.get('composer', ''),
+            game=header.get('game', '')
+        )
+        app.set_status("Offline playback" + (" with audio" if audio_enabled else ""))
 
-    # Playback thread
-    stop_event = threading.Event()
+        interceptor.start()
 
-    def playback_thread():
-        # Brief delay to let window/shaders initialize before playback starts
-        time.sleep(0.3)
+        # Playback thread
+        stop_event = threading.Event()
 
-        # Signal that playback is starting (for recording sync)
-        if hasattr(app, 'recording_started'):
-            app.recording_started = True
+        def playback_thread():
+            # Brief delay to let window/shaders initialize before playback starts
+            if stop_event.wait(0.3):
+                return
 
-        start_time = time.time()
-        cmd_idx = 0
-        samples_played = 0
+            # Signal that playback is starting (for recording sync)
+            if hasattr(app, 'recording_started'):
+                app.recording_started = True
 
-        while not stop_event.is_set() and cmd_idx < len(commands):
-            # Process any delayed visualization updates (audio latency compensation)
-            if process_delayed_updates:
-                process_delayed_updates()
+            # Deadlines are on the monotonic high-resolution clock
+            start_time = time.perf_counter()
+            cmd_idx = 0
+            samples_played = 0
+            # Samples each command waits, decoded for the whole stream up front
+            wait_table = command_wait_samples(commands).tolist()
 
-            cmd, args = commands[cmd_idx]
-            cmd_idx += 1
+            while not stop_event.is_set() and cmd_idx < len(commands):
+                # Process any delayed visualization updates (audio latency compensation)
+                if process_delayed_updates:
+                    process_delayed_updates()
 
-            # Process command synchronously
-            interceptor.process_command(cmd, args)
+                cmd, args = commands[cmd_idx]
+                wait_samples = wait_table[cmd_idx]
+                cmd_idx += 1
 
-            # Calculate wait time for timing commands
-            wait_samples = 0
-            if cmd == CMD_WAIT_NTSC:
-                wait_samples = FRAME_SAMPLES_NTSC
-            elif cmd == CMD_WAIT_PAL:
-                wait_samples = FRAME_SAMPLES_PAL
-            elif cmd == CMD_WAIT_FRAMES and len(args) >= 2:
-                wait_samples = args[0] | (args[1] << 8)
-            elif 0x70 <= cmd <= 0x7F:
-                wait_samples = (cmd & 0x0F) + 1
-            elif 0x80 <= cmd <= 0x8F:
-                wait_samples = cmd & 0x0F
-            elif cmd == CMD_RLE_WAIT_FRAME_1 and args:
-                wait_samples = args[0] * FRAME_SAMPLES_NTSC
-            elif cmd == CMD_END_OF_STREAM:
-                # Handle looping
-                if loop_count is not None and loop_index is not None:
-                    cmd_idx = loop_index
-                    continue
-                break
+                # Process command synchronously
+                interceptor.process_command(cmd, args)
 
-            if wait_samples > 0:
-                samples_played += wait_samples
-                # Update progress
-                elapsed = samples_played / 44100.0
-                progress = min(100, elapsed / total_duration * 100) if total_duration > 0 else 0
-                app.set_progress(progress, elapsed)
+                if cmd == CMD_END_OF_STREAM:
+                    # Handle looping
+                    if loop_count is not None and loop_index is not None:
+                        cmd_idx = loop_index
+                        continue
+                    break
 
-                # Real-time delay (audio playback provides its own timing)
-                target_time = start_time + elapsed
-                sleep_time = target_time - time.time()
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+                if wait_samples > 0:
+                    samples_played += wait_samples
+                    # Update progress
+                    elapsed = samples_played / 44100.0
+                    progress = min(100, elapsed / total_duration * 100) if total_duration > 0 else 0
+                    app.set_progress(progress, elapsed)
+
+                    # Real-time delay (audio playback provides its own timing):
+                    # sleep most of the way, then spin up to the deadline
+                    target_time = start_time + elapsed
+                    sleep_time = target_time - time.perf_counter() - _PLAYBACK_SPIN_SECONDS
+                    if sleep_time > 0 and stop_event.wait(sleep_time):
+                        break
+                    while time.perf_counter() < target_time:
+                        pass
 
-        app.set_status("Playback complete")
+            app.set_status("Playback complete")
 
-    thread = threading.Thread(target=playback_thread, daemon=True)
-    thread.start()
+        # On exit (in reverse): stop and join the playback thread, flush the
+        # interceptor, then the audio stream closes
+        resources.callback(interceptor.stop)
+        thread = threading.Thread(target=playback_thread, daemon=True)
+        thread.start()
+        resources.callback(thread.join)
+        resources.callback(stop_event.set)
 
-    # Run GUI
-    try:
+        # Run GUI
         app.run(title=f"Genesis Visualizer (Offline) - {filename}", fullscreen=fullscreen)
-    finally:
-        stop_event.set()
-        interceptor.stop()
-        if audio_stream is not None:
-            audio_stream.stop()
-            audio_stream.close()
 
-    return True
+        return True
 
 
 # =============================================================================
@@ -14,9 +14,25 @@ at a constant rate regardless of when commands arrive.
 Uses ymfm for YM2612 emulation.
 """
 
+import struct
+
 import numpy as np
 from typing import Optional, Callable
 
+# Numba (optional - compiles the chunk decoder and audio mixer to native
+# code). Without it both fall back to whole-array numpy operations.
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
 # Import emulators
 import sys
 import os
@@ -40,6 +56,385 @@ CMD_END_OF_STREAM = 0x66
 FRAME_SAMPLES_NTSC = 735
 FRAME_SAMPLES_PAL = 882
 
+# Little-endian sample count of a 0x61 wait
+_U16_LE = struct.Struct('<H')
+
+# Decoded op for a DAC write (0x80-0x8F); its wait is stored separately
+OP_DAC_WRITE = 0x80
+
+
+# Command handlers for process_command()
+_H_NONE = 0      # Ignored (end of stream, unknown)
+_H_PSG = 1       # PSG write
+_H_YM = 2        # YM2612 write (value = port)
+_H_WAIT = 3      # Fixed wait (value = samples)
+_H_WAIT_ARG = 4  # 16-bit sample count in args
+_H_DAC = 5       # DAC write + fixed wait (value = samples)
+_H_RLE = 6       # RLE frame wait (args[0] NTSC frames)
+
+
+def _build_cmd_table():
+    """
+    Build the 256-entry dispatch table used by process_command().
+
+    Each entry is (handler, arg_len, value); commands with fewer than
+    arg_len argument bytes are ignored (a DAC command still waits).
+    """
+    table = [(_H_NONE, 0, 0)] * 256
+    table[CMD_PSG_WRITE] = (_H_PSG, 1, 0)
+    table[CMD_YM2612_WRITE_A0] = (_H_YM, 2, 0)
+    table[CMD_YM2612_WRITE_A1] = (_H_YM, 2, 1)
+    table[CMD_WAIT_FRAMES] = (_H_WAIT_ARG, 2, 0)
+    table[CMD_WAIT_NTSC] = (_H_WAIT, 0, FRAME_SAMPLES_NTSC)
+    table[CMD_WAIT_PAL] = (_H_WAIT, 0, FRAME_SAMPLES_PAL)
+    for n in range(16):
+        table[0x70 + n] = (_H_WAIT, 0, n + 1)  # Short wait (1-16 samples)
+        table[0x80 + n] = (_H_DAC, 1, n)       # DAC + wait (0-15 samples)
+    table[CMD_RLE_WAIT_FRAME_1] = (_H_RLE, 1, 0)
+    return table
+
+
+_CMD_TABLE = _build_cmd_table()
+
+
+def _pitch_table(freqs):
+    """
+    Fractional MIDI pitch (69 + 12 * log2(freq / 440)) for each frequency.
+
+    Returns: list with None wherever freq is 20 Hz or below (no update sent)
+    """
+    freqs = np.asarray(freqs, dtype=np.float64)
+    audible = freqs > 20
+    pitches = np.full(len(freqs), np.nan)
+    pitches[audible] = 69.0 + 12.0 * np.log2(freqs[audible] / 440.0)
+    return [float(p) if ok else None for p, ok in zip(pitches, audible)]
+
+
+# Pitch of every FM block (0-7) / fnum (11-bit) pair, indexed by the packed
+# (block << 11) | fnum value, i.e. A4-A6 bits 0-5 above the A0-A2 byte:
+# F = (fnum * 7670453) / (144 * 2^(21-block)) ~= fnum * 0.02548 * 2^block
+_FM_FREQ = np.arange(1 << 14)
+_FM_PITCH_TABLE = _pitch_table((_FM_FREQ & 0x7FF) * 0.02548 * (1 << (_FM_FREQ >> 11)))
+del _FM_FREQ
+
+# Pitch of every PSG tone value (10-bit): F = 3579545 / (32 * tone).
+# Tone 0 is silent (frequency 0).
+_PSG_PITCH_TABLE = _pitch_table(
+    [0.0] + [3579545.0 / (32.0 * tone) for tone in range(1, 1024)])
+
+
+def _build_key_tables():
+    """
+    Key-change decode for every data byte.
+
+    Returns: (ym_keys, psg_keys) lists of (visualizer_channel, key_on)
+        ym_keys[data] for a YM2612 0x28 write, psg_keys[value] for a PSG
+        write; None where the byte doesn't change a key.
+    """
+    ym_keys = [None] * 256
+    psg_keys = [None] * 256
+    for data in range(256):
+        channel = data & 0x07
+        if channel >= 4:
+            channel = channel - 4 + 3  # Map 4-6 to 3-5
+        if channel < 6:
+            ym_keys[data] = (channel, (data & 0xF0) != 0)
+
+        if data & 0x80 and data & 0x10:  # PSG attenuation latch
+            psg_keys[data] = (6 + ((data >> 5) & 0x03), (data & 0x0F) < 15)
+    return ym_keys, psg_keys
+
+
+_YM_KEY_TABLE, _PSG_KEY_TABLE = _build_key_tables()
+
+
+# Audio mix levels: FM stereo sums 6 channels but normalizes by 1 channel
+# max, and PSG is scaled relative to FM
+FM_MIX_GAIN = 0.45
+PSG_MIX_GAIN = 0.10
+
+
+@njit(cache=True, fastmath=True)
+def _mix_stereo(fm_stereo, psg0, psg1, psg2, psg3, out):
+    """Mix (N, 2) FM stereo and the mono PSG channels into the (2, N) out, clipped to [-1, 1]."""
+    fm_gain = np.float32(FM_MIX_GAIN)
+    psg_gain = np.float32(PSG_MIX_GAIN)
+    for i in range(fm_stereo.shape[0]):
+        psg = (psg0[i] + psg1[i] + psg2[i] + psg3[i]) * psg_gain
+        for c in range(2):
+            sample = fm_stereo[i, c] * fm_gain + psg
+            out[c, i] = min(max(sample, np.float32(-1.0)), np.float32(1.0))
+
+
+# Full scale of int16 visualization waveforms (float sample 1.0 -> 32767)
+VIZ_INT16_SCALE = 32767.0
+
+
+@njit(cache=True, fastmath=True)
+def _quantize_int16(src, out, n):
+    """Quantize the first n samples of every row of src into int16 out (one pass)."""
+    scale = np.float32(VIZ_INT16_SCALE)
+    for ch in range(src.shape[0]):
+        for i in range(n):
+            sample = min(max(src[ch, i], np.float32(-1.0)), np.float32(1.0))
+            out[ch, i] = np.int16(sample * scale)
+
+
+@njit(cache=True)
+def _decode_chunk(data, ops, arg0, arg1, waits):
+    """
+    Decode a chunk of raw stream bytes into flat per-command arrays.
+
+    Each decoded command is a chip write (ops = CMD_PSG_WRITE,
+    CMD_YM2612_WRITE_A0/A1 or OP_DAC_WRITE, with its data in arg0/arg1)
+    followed by waits[k] samples. Consecutive waits are merged into the
+    preceding entry, so the emulators render each gap between writes in one
+    call; waits before the first write are stored with op 0. Commands whose
+    arguments are cut off by the end of the chunk are dropped, except for
+    the wait part of a DAC command.
+
+    Returns: number of decoded commands
+    """
+    n = len(data)
+    count = 0
+    i = 0
+    while i < n:
+        cmd = data[i]
+        op = 0
+        a0 = 0
+        a1 = 0
+        wait = 0
+        size = 1
+        valid = True
+
+        if cmd == CMD_PSG_WRITE:
+            size = 2
+            valid = i + 1 < n
+            if valid:
+                op = cmd
+                a0 = data[i + 1]
+        elif cmd == CMD_YM2612_WRITE_A0 or cmd == CMD_YM2612_WRITE_A1:
+            size = 3
+            valid = i + 2 < n
+            if valid:
+                op = cmd
+                a0 = data[i + 1]
+                a1 = data[i + 2]
+        elif cmd == CMD_WAIT_FRAMES:
+            size = 3
+            valid = i + 2 < n
+            if valid:
+                wait = data[i + 1] | (data[i + 2] << 8)
+        elif cmd == CMD_WAIT_NTSC:
+            wait = FRAME_SAMPLES_NTSC
+        elif cmd == CMD_WAIT_PAL:
+            wait = FRAME_SAMPLES_PAL
+        elif 0x70 <= cmd <= 0x7F:
+            # Short wait (1-16 samples)
+            wait = (cmd & 0x0F) + 1
+        elif 0x80 <= cmd <= 0x8F:
+            # DAC + wait (the wait still applies if the data byte is missing)
+            size = 2
+            wait = cmd & 0x0F
+            if i + 1 < n:
+                op = OP_DAC_WRITE
+                a0 = data[i + 1]
+        elif cmd == CMD_RLE_WAIT_FRAME_1:
+            size = 2
+            valid = i + 1 < n
+            if valid:
+                wait = data[i + 1] * FRAME_SAMPLES_NTSC
+        else:
+            valid = False
+
+        if valid:
+            if op == 0 and count > 0:
+                waits[count - 1] += wait
+            elif op != 0 or wait > 0:
+                ops[count] = op
+                arg0[count] = a0
+                arg1[count] = a1
+                waits[count] = wait
+                count += 1
+        i += size
+
+    return count
+
+
+def _build_decode_tables():
+    """
+    Per-opcode tables for the vectorized decoder.
+
+    Returns: (size, fixed_wait, arg_wait) arrays of 256 entries
+        size: command length in bytes (1 for unknown opcodes)
+        fixed_wait: wait in samples that doesn't depend on the arguments
+        arg_wait: 1 for 0x61 (16-bit samples), 2 for 0xC0 (NTSC frames)
+    """
+    size = np.ones(256, dtype=np.int64)
+    fixed_wait = np.zeros(256, dtype=np.int64)
+    arg_wait = np.zeros(256, dtype=np.int64)
+    size[[CMD_PSG_WRITE, CMD_RLE_WAIT_FRAME_1]] = 2
+    size[[CMD_YM2612_WRITE_A0, CMD_YM2612_WRITE_A1, CMD_WAIT_FRAMES]] = 3
+    size[0x80:0x90] = 2
+    fixed_wait[CMD_WAIT_NTSC] = FRAME_SAMPLES_NTSC
+    fixed_wait[CMD_WAIT_PAL] = FRAME_SAMPLES_PAL
+    fixed_wait[0x70:0x80] = np.arange(1, 17)
+    fixed_wait[0x80:0x90] = np.arange(16)
+    arg_wait[CMD_WAIT_FRAMES] = 1
+    arg_wait[CMD_RLE_WAIT_FRAME_1] = 2
+    return size, fixed_wait, arg_wait
+
+
+_CMD_SIZE, _CMD_FIXED_WAIT, _CMD_ARG_WAIT = _build_decode_tables()
+_CMD_KNOWN = (_CMD_FIXED_WAIT > 0) | (_CMD_ARG_WAIT > 0) | (_CMD_SIZE > 1)
+
+
+def _decode_chunk_vectorized(data):
+    """
+    Same result as _decode_chunk, computed with whole-array numpy operations.
+
+    Used when Numba isn't available. Command boundaries are found by pointer
+    doubling over the per-byte command lengths, so there is no per-byte
+    Python loop.
+
+    Returns: (ops, arg0, arg1, waits) integer arrays
+    """
+    arr = np.frombuffer(data, dtype=np.uint8)
+    n = len(arr)
+    if n == 0:
+        return tuple(np.zeros(0, dtype=np.int64) for _ in range(4))
+
+    # next_pos[i] = start of the command after one starting at byte i
+    # (index n = past the end, which maps to itself)
+    size = _CMD_SIZE[arr]
+    next_pos = np.minimum(np.arange(n) + size, n)
+    next_pos = np.append(next_pos, n)
+
+    # Mark every command start reachable from byte 0: jumps[k] advances
+    # 2^k commands, applied from the largest jump down
+    jumps = [next_pos]
+    while (1 << len(jumps)) < n:
+        jumps.append(jumps[-1][jumps[-1]])
+    is_start = np.zeros(n + 1, dtype=bool)
+    is_start[0] = True
+    for jump in reversed(jumps):
+        is_start[jump[is_start]] = True
+    starts = np.flatnonzero(is_start[:n])
+
+    cmds = arr[starts]
+    padded = np.append(arr, np.zeros(2, dtype=np.uint8)).astype(np.int64)
+    a0 = padded[starts + 1]
+    a1 = padded[starts + 2]
+    complete = starts + _CMD_SIZE[cmds] <= n
+
+    is_write = (cmds == CMD_PSG_WRITE) | (cmds == CMD_YM2612_WRITE_A0) | (cmds == CMD_YM2612_WRITE_A1)
+    is_dac = (cmds >= 0x80) & (cmds <= 0x8F)
+    ops = np.where(is_write & complete, cmds, 0)
+    ops[is_dac & complete] = OP_DAC_WRITE
+
+    arg_wait = _CMD_ARG_WAIT[cmds]
+    waits = _CMD_FIXED_WAIT[cmds].copy()
+    waits[(arg_wait == 1) & complete] = (a0 | (a1 << 8))[(arg_wait == 1) & complete]
+    waits[(arg_wait == 2) & complete] = (a0 * FRAME_SAMPLES_NTSC)[(arg_wait == 2) & complete]
+
+    # Drop unknown and cut-off commands (a cut-off DAC command still waits)
+    keep = _CMD_KNOWN[cmds] & (complete | is_dac) & ((ops != 0) | (waits > 0))
+    ops, waits = ops[keep], waits[keep]
+    a0 = np.where(ops != 0, a0[keep], 0)
+    a1 = np.where((ops == CMD_YM2612_WRITE_A0) | (ops == CMD_YM2612_WRITE_A1), a1[keep], 0)
+
+    # Merge each pure wait into the entry before it; waits ahead of the
+    # first write form one op-0 entry
+    group = np.cumsum(ops != 0)
+    group_waits = np.bincount(group, weights=waits, minlength=1).astype(np.int64)
+    entries = np.flatnonzero(ops != 0)
+    if group_waits[0] > 0:
+        entries = np.concatenate(([0], entries))
+    return ops[entries], a0[entries], a1[entries], group_waits[group[entries]]
+
+
+class ParsedStream:
+    """
+    VGM command data decoded once into struct-of-arrays form.
+
+    Each entry is one write followed by the wait after it, across four
+    parallel integer arrays:
+      ops   - CMD_PSG_WRITE, CMD_YM2612_WRITE_A0/A1, OP_DAC_WRITE, or 0
+              (no write, only a wait)
+      arg0  - write register/value
+      arg1  - YM2612 write data
+      waits - samples to render after the write (consecutive waits merged)
+
+    Built by CommandInterceptor.preparse() and replayed (whole or in entry
+    ranges) with CommandInterceptor.process_parsed().
+    """
+
+    def __init__(self, ops, arg0, arg1, waits):
+        self.ops = ops
+        self.arg0 = arg0
+        self.arg1 = arg1
+        self.waits = waits
+
+    def __len__(self):
+        return len(self.ops)
+
+
+class AudioRing:
+    """
+    Lock-free single-producer/single-consumer stereo ring buffer.
+
+    The interceptor writes flushed audio straight into the ring and the
+    audio device callback reads from it. Each side only advances its own
+    position, after it has finished touching the data, so no lock is
+    needed. The first `mirror` frames are duplicated past the end, so reads
+    and writes of up to `mirror` frames are always one contiguous slice.
+    """
+
+    def __init__(self, size: int = 44100, mirror: int = 4096):
+        self.size = size
+        self.mirror = mirror  # Largest contiguous read/write
+        self.data = np.zeros((size + mirror, 2), dtype=np.float32)
+        self.write_pos = 0  # Only advanced by the producer
+        self.read_pos = 0  # Only advanced by the consumer
+
+    def write(self, samples: np.ndarray):
+        """Append stereo samples (producer side)."""
+        buf = self.data
+        size = self.size
+        mirror = self.mirror
+
+        for start in range(0, len(samples), mirror):
+            block = samples[start:start + mirror]
+            write_pos = self.write_pos
+            end_pos = write_pos + len(block)
+
+            # One contiguous write; a wrapping block runs into the mirrored
+            # tail, so only the wrapped part is copied back to the head
+            buf[write_pos:end_pos] = block
+            if end_pos > size:
+                buf[:end_pos - size] = buf[size:end_pos]
+            elif write_pos < mirror:
+                # Keep the mirrored tail in sync with the head of the ring
+                buf[size + write_pos:size + min(end_pos, mirror)] = buf[write_pos:min(end_pos, mirror)]
+            self.write_pos = end_pos % size
+
+    def read_into(self, out: np.ndarray) -> bool:
+        """
+        Fill out with the next len(out) frames (consumer side).
+
+        Returns: False (and fills out with silence) if not enough is buffered
+        """
+        frames = len(out)
+        read_pos = self.read_pos
+        available = (self.write_pos - read_pos) % self.size
+        if available >= frames and frames <= self.mirror:
+            # Single contiguous read (mirrored tail covers the wrap)
+            out[:] = self.data[read_pos:read_pos + frames]
+            self.read_pos = (read_pos + frames) % self.size
+            return True
+        out.fill(0)
+        return False
+
 
 class CommandInterceptor:
     """
@@ -65,6 +460,10 @@ class CommandInterceptor:
     # Pre-allocated buffer size (must be >= MAX_SAMPLES_FOR_UPDATE)
     BUFFER_SIZE = 4096
 
+    # Stereo buffers rotated between flushes; on_audio_output receives a view
+    # that stays valid until this many further flushes
+    AUDIO_BUFFER_COUNT = 3
+
     def __init__(self):
         # Emulators
         self.ym2612 = YM2612ymfm()
@@ -73,9 +472,17 @@ class CommandInterceptor:
         # Waveform callback
         self.on_waveform_update: Optional[Callable[[int, np.ndarray], None]] = None
 
-        # Audio output callback (stereo samples for speaker output)
+        # Batched waveform callback: one (10, n) view of all channels per flush
+        # (row = visualizer channel). Used instead of on_waveform_update when set.
+        self.on_waveform_batch: Optional[Callable[[np.ndarray], None]] = None
+
+        # Audio output callback (stereo samples for speaker output). The array
+        # is a view into a rotating buffer - copy it to keep it.
         self.on_audio_output: Optional[Callable[[np.ndarray], None]] = None
 
+        # Audio ring buffer (filled directly on flush, no callback)
+        self.audio_ring: Optional[AudioRing] = None
+
         # Key-on callback
         self.on_key_change: Optional[Callable[[int, bool], None]] = None
 
@@ -89,14 +496,25 @@ class CommandInterceptor:
         self._dac_enabled = False
 
         # Pre-allocated sample buffers (avoid list allocations)
-        self._fm_buffers = [np.zeros(self.BUFFER_SIZE, dtype=np.float32) for _ in range(6)]
-        self._psg_buffers = [np.zeros(self.BUFFER_SIZE, dtype=np.float32) for _ in range(4)]
-        self._stereo_buffer = np.zeros((self.BUFFER_SIZE, 2), dtype=np.float32)
+        # (rows of one block indexed by visualizer channel: FM 0-5, PSG 6-9)
+        self._channel_block = np.zeros((10, self.BUFFER_SIZE), dtype=np.float32)
+        self._channel_buffers = list(self._channel_block)
+
+        # Waveform sample type sent to the waveform callbacks. Set to np.int16 to
+        # get waveforms quantized to +/-VIZ_INT16_SCALE (half the bytes).
+        self.viz_dtype = np.float32
+        self._viz_block = np.zeros((10, self.BUFFER_SIZE), dtype=np.int16)
+        self._viz_buffers = list(self._viz_block)
+        # Stereo mix is stored channel-major (2, BUFFER_SIZE) so each channel is contiguous
+        self._stereo_buffers = [np.zeros((2, self.BUFFER_SIZE), dtype=np.float32)
+                                for _ in range(self.AUDIO_BUFFER_COUNT)]
+        self._stereo_index = 0
+        self._stereo_buffer = self._stereo_buffers[0]
+        self._psg_mix = np.zeros(self.BUFFER_SIZE, dtype=np.float32)  # Mono PSG mix scratch
         self._buffer_pos = 0  # Current write position in buffers
 
-        # FM frequency tracking (fnum, block per channel)
-        self._fm_fnum = [0] * 6
-        self._fm_block = [0] * 6
+        # FM frequency tracking, (block << 11) | fnum per channel
+        self._fm_freq = [0] * 6
 
         # PSG frequency tracking (10-bit tone value per channel)
         self._psg_tone = [0] * 3
@@ -130,65 +548,62 @@ class CommandInterceptor:
         if not self._running:
             return
 
-        i = 0
-        while i < len(data):
-            cmd = data[i]
-
-            if cmd == CMD_PSG_WRITE:
-                if i + 1 < len(data):
-                    self._apply_psg_write(data[i + 1])
-                i += 2
-
-            elif cmd == CMD_YM2612_WRITE_A0:
-                if i + 2 < len(data):
-                    self._apply_ym_write(0, data[i + 1], data[i + 2])
-                i += 3
-
-            elif cmd == CMD_YM2612_WRITE_A1:
-                if i + 2 < len(data):
-                    self._apply_ym_write(1, data[i + 1], data[i + 2])
-                i += 3
-
-            elif cmd == CMD_WAIT_FRAMES:
-                if i + 2 < len(data):
-                    samples = data[i + 1] | (data[i + 2] << 8)
-                    self._generate_samples(samples)
-                i += 3
-
-            elif cmd == CMD_WAIT_NTSC:
-                self._generate_samples(FRAME_SAMPLES_NTSC)
-                i += 1
-
-            elif cmd == CMD_WAIT_PAL:
-                self._generate_samples(FRAME_SAMPLES_PAL)
-                i += 1
-
-            elif 0x70 <= cmd <= 0x7F:
-                # Short wait (1-16 samples)
-                samples = (cmd & 0x0F) + 1
-                self._generate_samples(samples)
-                i += 1
-
-            elif 0x80 <= cmd <= 0x8F:
-                # DAC + wait
-                if i + 1 < len(data):
-                    self.ym2612.write(0, 0x2A, data[i + 1])
-                wait_samples = cmd & 0x0F
-                if wait_samples > 0:
-                    self._generate_samples(wait_samples)
-                i += 2
-
-            elif cmd == CMD_RLE_WAIT_FRAME_1:
-                if i + 1 < len(data):
-                    total_samples = data[i + 1] * FRAME_SAMPLES_NTSC
-                    self._generate_samples(total_samples)
-                i += 2
-
-            elif cmd == CMD_END_OF_STREAM:
-                i += 1
+        self.process_parsed(self.preparse(data))
 
-            else:
-                i += 1
+    @staticmethod
+    def preparse(data: bytes) -> ParsedStream:
+        """
+        Decode raw VGM command bytes once, for replay with process_parsed().
+
+        Uses native code when Numba is available, whole-array numpy
+        operations otherwise. A command cut off at the end of data is
+        dropped (a cut-off DAC command keeps its wait).
+        """
+        if _HAS_NUMBA:
+            size = len(data)
+            ops = np.empty(size, dtype=np.int32)
+            arg0 = np.empty(size, dtype=np.int32)
+            arg1 = np.empty(size, dtype=np.int32)
+            waits = np.empty(size, dtype=np.int64)
+            count = _decode_chunk(np.frombuffer(data, dtype=np.uint8), ops, arg0, arg1, waits)
+            return ParsedStream(ops[:count], arg0[:count], arg1[:count], waits[:count])
+        return ParsedStream(*_decode_chunk_vectorized(data))
+
+    def process_parsed(self, parsed: ParsedStream, start: int = 0, end: Optional[int] = None):
+        """
+        Apply entries [start, end) of a preparsed stream SYNCHRONOUSLY.
+
+        Same effect as process_chunk() on the bytes the entries came from,
+        without decoding them again (e.g. when replaying a loop).
+        """
+        if not self._running:
+            return
+
+        if end is None:
+            end = len(parsed)
+        ops = parsed.ops[start:end].tolist()
+        arg0 = parsed.arg0[start:end].tolist()
+        arg1 = parsed.arg1[start:end].tolist()
+        waits = parsed.waits[start:end].tolist()
+
+        # Bound methods resolved once for the whole loop
+        apply_psg = self._apply_psg_write
+        apply_ym = self._apply_ym_write
+        ymw = self.ym2612.write
+        gen = self._generate_samples
+
+        for op, a0, a1, wait in zip(ops, arg0, arg1, waits):
+            if op == CMD_PSG_WRITE:
+                apply_psg(a0)
+            elif op == CMD_YM2612_WRITE_A0:
+                apply_ym(0, a0, a1)
+            elif op == CMD_YM2612_WRITE_A1:
+                apply_ym(1, a0, a1)
+            elif op == OP_DAC_WRITE:
+                ymw(0, 0x2A, a0)
+
+            if wait > 0:
+                gen(wait)
 
     def process_command(self, cmd: int, args: bytes):
         """
@@ -199,44 +614,31 @@ class CommandInterceptor:
         if not self._running:
             return
 
-        if cmd == CMD_PSG_WRITE:
-            if args:
-                self._apply_psg_write(args[0])
-
-        elif cmd == CMD_YM2612_WRITE_A0:
-            if len(args) >= 2:
-                self._apply_ym_write(0, args[0], args[1])
+        handler, arg_len, value = _CMD_TABLE[cmd]
 
-        elif cmd == CMD_YM2612_WRITE_A1:
-            if len(args) >= 2:
-                self._apply_ym_write(1, args[0], args[1])
+        if handler == _H_DAC:
+            if args:
+                self.ym2612.write(0, 0x2A, args[0])
+            if value > 0:
+                self._generate_samples(value)
 
-        elif cmd == CMD_WAIT_FRAMES:
-            if len(args) >= 2:
-                samples = args[0] | (args[1] << 8)
-                self._generate_samples(samples)
+        elif handler == _H_WAIT:
+            self._generate_samples(value)
 
-        elif cmd == CMD_WAIT_NTSC:
-            self._generate_samples(FRAME_SAMPLES_NTSC)
+        elif handler == _H_NONE or len(args) < arg_len:
+            return
 
-        elif cmd == CMD_WAIT_PAL:
-            self._generate_samples(FRAME_SAMPLES_PAL)
+        elif handler == _H_YM:
+            self._apply_ym_write(value, args[0], args[1])
 
-        elif 0x70 <= cmd <= 0x7F:
-            samples = (cmd & 0x0F) + 1
-            self._generate_samples(samples)
+        elif handler == _H_PSG:
+            self._apply_psg_write(args[0])
 
-        elif 0x80 <= cmd <= 0x8F:
-            if args:
-                self.ym2612.write(0, 0x2A, args[0])
-            wait_samples = cmd & 0x0F
-            if wait_samples > 0:
-                self._generate_samples(wait_samples)
+        elif handler == _H_WAIT_ARG:
+            self._generate_samples(_U16_LE.unpack_from(args)[0])
 
-        elif cmd == CMD_RLE_WAIT_FRAME_1:
-            if args:
-                total_samples = args[0] * FRAME_SAMPLES_NTSC
-                self._generate_samples(total_samples)
+        elif handler == _H_RLE:
+            self._generate_samples(args[0] * FRAME_SAMPLES_NTSC)
 
     def _apply_psg_write(self, value: int):
         """Apply a PSG write and check for key/frequency changes."""
@@ -246,22 +648,59 @@ class CommandInterceptor:
         self._check_psg_frequency(value)
 
         # Check for key changes (attenuation commands)
-        if value & 0x80 and value & 0x10:  # Attenuation latch
-            channel = (value >> 5) & 0x03
-            atten = value & 0x0F
-            is_on = atten < 15
-            if self.on_key_change:
-                self.on_key_change(6 + channel, is_on)
+        key = _PSG_KEY_TABLE[value]
+        if key is not None and self.on_key_change:
+            self.on_key_change(*key)
 
     def _apply_ym_write(self, port: int, addr: int, data: int):
         """Apply a YM2612 write and check for key/DAC/frequency changes."""
         self.ym2612.write(port, addr, data)
-        self._check_ym_key_change(addr, data)
-        self._check_dac_change(port, addr, data)
-        self._check_fm_frequency(port, addr, data)
+
+        # Most writes (operator/envelope registers) match none of these
+        if addr == 0x28:
+            # Key on/off register
+            key = _YM_KEY_TABLE[data]
+            if key is not None and self.on_key_change:
+                self.on_key_change(*key)
+
+        elif addr == 0x2B:
+            # Register 0x2B on port 0 controls DAC enable (bit 7)
+            if port == 0:
+                new_dac_state = bool(data & 0x80)
+                if new_dac_state != self._dac_enabled:
+                    self._dac_enabled = new_dac_state
+                    if self.on_dac_mode_change:
+                        self.on_dac_mode_change(new_dac_state)
+
+        elif 0xA0 <= addr <= 0xA6:
+            # Frequency registers: A0-A2 (low byte), A4-A6 (high byte + block)
+            # Port 0 = channels 0-2, Port 1 = channels 3-5
+            base_ch = 0 if port == 0 else 3
+
+            if addr <= 0xA2:
+                # Low byte of fnum
+                ch = base_ch + (addr - 0xA0)
+                self._fm_freq[ch] = (self._fm_freq[ch] & 0x3F00) | data
+                self._update_fm_pitch(ch)
+            elif addr >= 0xA4:
+                # High bits of fnum (0-2) + block (3-5), one masked merge
+                ch = base_ch + (addr - 0xA4)
+                self._fm_freq[ch] = (self._fm_freq[ch] & 0xFF) | ((data & 0x3F) << 8)
+                self._update_fm_pitch(ch)
 
     def _generate_samples(self, num_samples: int):
         """Generate samples and buffer them for visualization and audio."""
+        # Nothing consumes samples: skip rendering (register writes, key and
+        # pitch callbacks are still tracked)
+        if not (self.on_waveform_update or self.on_waveform_batch or self.on_audio_output
+                or self.audio_ring is not None):
+            return
+
+        # Long (merged) waits are rendered in buffer-sized blocks
+        while num_samples > self.BUFFER_SIZE:
+            self._generate_samples(self.BUFFER_SIZE)
+            num_samples -= self.BUFFER_SIZE
+
         if num_samples <= 0:
             return
 
@@ -269,30 +708,33 @@ class CommandInterceptor:
         if self._buffer_pos + num_samples > self.BUFFER_SIZE:
             self._flush_buffers()
 
-        # Generate from both chips
-        fm_waves = self.ym2612.generate_samples(num_samples)
-        psg_waves = self.sn76489.generate_samples(num_samples)
-
-        # Copy to pre-allocated buffers (fast numpy slice assignment)
+        # Generate from both chips straight into the pre-allocated buffers
         pos = self._buffer_pos
         end = pos + num_samples
-        for ch in range(6):
-            self._fm_buffers[ch][pos:end] = fm_waves[ch]
-        for ch in range(4):
-            self._psg_buffers[ch][pos:end] = psg_waves[ch]
+        self.ym2612.generate_samples(num_samples, out=self._channel_block[:6, pos:end])
+        psg_waves = self._channel_block[6:, pos:end]
+        if self.sn76489.is_silent():
+            # A muted PSG renders zeros and keeps its phase/noise state
+            psg_waves.fill(0.0)
+        else:
+            self.sn76489.generate_samples(num_samples, out=psg_waves)
 
         # Capture stereo output if audio callback is set
-        if self.on_audio_output:
+        if self.on_audio_output or self.audio_ring is not None:
             stereo = self.ym2612.get_stereo_buffer()  # Shape: (num_samples, 2)
-            # FM stereo sums 6 channels but normalizes by 1 channel max - scale down
-            stereo *= 0.45
-            # Add PSG to stereo mix (PSG is mono, sum and add to both channels)
-            psg_mix = psg_waves[0] + psg_waves[1] + psg_waves[2] + psg_waves[3]
-            psg_mix *= 0.10  # Scale PSG relative to FM
-            stereo[:, 0] += psg_mix
-            stereo[:, 1] += psg_mix
-            # Clip and copy to buffer
-            np.clip(stereo, -1.0, 1.0, out=self._stereo_buffer[pos:end])
+            out = self._stereo_buffer[:, pos:end]
+            if _HAS_NUMBA:
+                _mix_stereo(stereo, psg_waves[0], psg_waves[1], psg_waves[2], psg_waves[3], out)
+            else:
+                np.multiply(stereo.T, FM_MIX_GAIN, out=out)
+                # Add PSG to stereo mix (PSG is mono, one broadcast over both channels)
+                psg_mix = self._psg_mix[:num_samples]
+                np.add(psg_waves[0], psg_waves[1], out=psg_mix)
+                psg_mix += psg_waves[2]
+                psg_mix += psg_waves[3]
+                psg_mix *= PSG_MIX_GAIN
+                out += psg_mix[None, :]
+                np.clip(out, -1.0, 1.0, out=out)
 
         self._buffer_pos = end
 
@@ -307,88 +749,58 @@ class CommandInterceptor:
 
         buf_len = self._buffer_pos
 
-        # Send stereo to audio output (single slice, no concatenation)
-        if self.on_audio_output:
-            self.on_audio_output(self._stereo_buffer[:buf_len].copy())
+        # Interleaved (buf_len, 2) view of the channel-major mix (no copy)
+        stereo = self._stereo_buffer[:, :buf_len].T
+
+        if self.audio_ring is not None:
+            self.audio_ring.write(stereo)
 
-        if self.on_waveform_update:
-            # Send FM channels (slice from pre-allocated buffer)
-            for ch in range(6):
+        # Send stereo to audio output (a view, no copy) and switch to the
+        # next buffer so the samples handed out aren't overwritten
+        if self.on_audio_output:
+            self.on_audio_output(stereo)
+            self._stereo_index = (self._stereo_index + 1) % self.AUDIO_BUFFER_COUNT
+            self._stereo_buffer = self._stereo_buffers[self._stereo_index]
+
+        on_batch = self.on_waveform_batch
+        on_waveform = self.on_waveform_update
+        if on_batch or on_waveform:
+            channel_block = self._channel_block
+            channel_buffers = self._channel_buffers
+            if self.viz_dtype == np.int16:
+                channel_block = self._viz_block
+                channel_buffers = self._viz_buffers
+                if _HAS_NUMBA:
+                    _quantize_int16(self._channel_block, self._viz_block, buf_len)
+                else:
+                    src = self._channel_block[:, :buf_len]
+                    np.clip(src, -1.0, 1.0, out=src)
+                    np.multiply(src, VIZ_INT16_SCALE, out=self._viz_block[:, :buf_len],
+                                casting='unsafe')
+
+            # Send FM channels 0-5, then PSG channels 6-9 (slices of the
+            # pre-allocated buffers)
+            if on_batch:
+                # All channels in one call
+                on_batch(channel_block[:, :buf_len])
+            elif buf_len <= self.MAX_SAMPLES_FOR_UPDATE:
+                # Common case: one update per channel
+                for ch, buf in enumerate(channel_buffers):
+                    on_waveform(ch, buf[:buf_len])
+            else:
                 # Send in chunks if too large
-                pos = 0
-                while pos < buf_len:
-                    end = min(pos + self.MAX_SAMPLES_FOR_UPDATE, buf_len)
-                    self.on_waveform_update(ch, self._fm_buffers[ch][pos:end])
-                    pos = end
-
-            # Send PSG channels
-            for ch in range(4):
-                pos = 0
-                while pos < buf_len:
-                    end = min(pos + self.MAX_SAMPLES_FOR_UPDATE, buf_len)
-                    self.on_waveform_update(6 + ch, self._psg_buffers[ch][pos:end])
-                    pos = end
+                for ch, buf in enumerate(channel_buffers):
+                    for pos in range(0, buf_len, self.MAX_SAMPLES_FOR_UPDATE):
+                        on_waveform(ch, buf[pos:min(pos + self.MAX_SAMPLES_FOR_UPDATE, buf_len)])
 
         # Reset buffer position (no need to clear arrays)
         self._buffer_pos = 0
 
-    def _check_ym_key_change(self, addr: int, data: int):
-        """Check for key-on/off changes in YM2612 writes."""
-        if addr == 0x28:  # Key on/off register
-            channel = data & 0x07
-            if channel >= 4:
-                channel = channel - 4 + 3  # Map 4-6 to 3-5
-
-            if channel < 6:
-                key_on = (data & 0xF0) != 0
-                if self.on_key_change:
-                    self.on_key_change(channel, key_on)
-
-    def _check_dac_change(self, port: int, addr: int, data: int):
-        """Check for DAC enable/disable in YM2612 writes."""
-        # Register 0x2B on port 0 controls DAC enable (bit 7)
-        if port == 0 and addr == 0x2B:
-            new_dac_state = bool(data & 0x80)
-            if new_dac_state != self._dac_enabled:
-                self._dac_enabled = new_dac_state
-                if self.on_dac_mode_change:
-                    self.on_dac_mode_change(new_dac_state)
-
-    def _check_fm_frequency(self, port: int, addr: int, data: int):
-        """Track FM frequency changes and send pitch updates."""
-        # Frequency registers: A0-A2 (low byte), A4-A6 (high byte + block)
-        # Port 0 = channels 0-2, Port 1 = channels 3-5
-        base_ch = 0 if port == 0 else 3
-
-        if 0xA0 <= addr <= 0xA2:
-            # Low byte of fnum
-            ch = base_ch + (addr - 0xA0)
-            self._fm_fnum[ch] = (self._fm_fnum[ch] & 0x700) | data
-            self._update_fm_pitch(ch)
-        elif 0xA4 <= addr <= 0xA6:
-            # High byte of fnum + block
-            ch = base_ch + (addr - 0xA4)
-            self._fm_fnum[ch] = (self._fm_fnum[ch] & 0xFF) | ((data & 0x07) << 8)
-            self._fm_block[ch] = (data >> 3) & 0x07
-            self._update_fm_pitch(ch)
-
     def _update_fm_pitch(self, channel: int):
-        """Calculate fractional MIDI pitch from FM fnum/block and send update."""
-        import math
-        fnum = self._fm_fnum[channel]
-        block = self._fm_block[channel]
-
-        if fnum == 0:
-            return
-
-        # YM2612 frequency: F = (fnum * 7670453) / (144 * 2^(21-block))
-        freq = fnum * 0.02548 * (1 << block)
-
-        # Convert to fractional MIDI pitch: MIDI = 69 + 12 * log2(freq / 440)
-        if freq > 20:
-            pitch = 69.0 + 12.0 * math.log2(freq / 440.0)
-            if self.on_pitch_change:
-                self.on_pitch_change(channel, pitch)
+        """Look up fractional MIDI pitch from FM fnum/block and send update."""
+        pitch = _FM_PITCH_TABLE[self._fm_freq[channel]]
+        if pitch is not None and self.on_pitch_change:
+            self.on_pitch_change(channel, pitch)
 
     def _check_psg_frequency(self, value: int):
         """Track PSG frequency changes and send pitch updates."""
@@ -410,21 +822,10 @@ class CommandInterceptor:
                 self._update_psg_pitch(self._psg_latch_channel)
 
     def _update_psg_pitch(self, channel: int):
-        """Calculate fractional MIDI pitch from PSG tone value and send update."""
-        import math
-        tone = self._psg_tone[channel]
-
-        if tone == 0:
-            return
-
-        # PSG frequency: F = 3579545 / (32 * tone)
-        freq = 3579545.0 / (32.0 * tone)
-
-        # Convert to fractional MIDI pitch
-        if freq > 20:
-            pitch = 69.0 + 12.0 * math.log2(freq / 440.0)
-            if self.on_pitch_change:
-                self.on_pitch_change(6 + channel, pitch)  # PSG channels are 6-8
+        """Look up fractional MIDI pitch from PSG tone value and send update."""
+        pitch = _PSG_PITCH_TABLE[self._psg_tone[channel]]
+        if pitch is not None and self.on_pitch_change:
+            self.on_pitch_change(6 + channel, pitch)  # PSG channels are 6-8
 
     def is_dac_enabled(self) -> bool:
         """Check if DAC mode is currently enabled."""
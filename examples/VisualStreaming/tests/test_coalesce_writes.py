@@ -0,0 +1,70 @@
+"""Tests for the skip-ahead write coalescer in stream_vgm_visual."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stream_vgm_visual import (  # noqa: E402
+    CMD_YM2612_WRITE_A0, CMD_YM2612_WRITE_A1, _coalesce_writes,
+)
+
+
+def _pack(writes):
+    """Build (cmd_table, blob, offsets) from a list of (cmd, reg, data)."""
+    cmd_table, blob, offsets = [], bytearray(), []
+    for cmd, reg, data in writes:
+        offsets.append(len(blob))
+        cmd_table.append(cmd)
+        blob += bytes((cmd, reg, data))
+    offsets.append(len(blob))
+    return cmd_table, bytes(blob), offsets
+
+
+def _coalesce(writes):
+    cmd_table, blob, offsets = _pack(writes)
+    out = _coalesce_writes(cmd_table, blob, offsets, 0, len(writes))
+    return [(cmd, args[0], args[1]) for cmd, args in out]
+
+
+def test_latch_is_shared_by_later_commits():
+    # The latch keeps its value after a commit, so channel 1 gets it too
+    out = _coalesce([
+        (CMD_YM2612_WRITE_A0, 0xA4, 0x22),
+        (CMD_YM2612_WRITE_A0, 0xA0, 0x10),
+        (CMD_YM2612_WRITE_A0, 0xA1, 0x20),
+    ])
+    assert out == [
+        (CMD_YM2612_WRITE_A0, 0xA4, 0x22), (CMD_YM2612_WRITE_A0, 0xA0, 0x10),
+        (CMD_YM2612_WRITE_A0, 0xA4, 0x22), (CMD_YM2612_WRITE_A0, 0xA1, 0x20),
+    ]
+
+
+def test_last_commit_wins():
+    out = _coalesce([
+        (CMD_YM2612_WRITE_A0, 0xA4, 0x22),
+        (CMD_YM2612_WRITE_A0, 0xA0, 0x10),
+        (CMD_YM2612_WRITE_A0, 0xA0, 0x30),
+    ])
+    assert out == [(CMD_YM2612_WRITE_A0, 0xA4, 0x22), (CMD_YM2612_WRITE_A0, 0xA0, 0x30)]
+
+
+def test_commit_without_latch_in_span_is_kept():
+    # Uses the latch from before the span: replayed on its own
+    out = _coalesce([
+        (CMD_YM2612_WRITE_A1, 0xA8, 0x01),
+        (CMD_YM2612_WRITE_A1, 0xA8, 0x02),
+    ])
+    assert out == [(CMD_YM2612_WRITE_A1, 0xA8, 0x02)]
+
+
+def test_trailing_latch_is_kept():
+    out = _coalesce([
+        (CMD_YM2612_WRITE_A0, 0xA4, 0x22),
+        (CMD_YM2612_WRITE_A0, 0xA0, 0x10),
+        (CMD_YM2612_WRITE_A0, 0xA4, 0x33),
+    ])
+    assert out == [
+        (CMD_YM2612_WRITE_A0, 0xA4, 0x22), (CMD_YM2612_WRITE_A0, 0xA0, 0x10),
+        (CMD_YM2612_WRITE_A0, 0xA4, 0x33),
+    ]
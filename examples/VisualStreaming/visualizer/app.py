@@ -27,6 +27,9 @@ class VisualizerApp:
     # Furnace uses 65536 - we use 8192 for reasonable memory usage
     WAVEFORM_SAMPLES = 8192
 
+    # Scale applied to int16 (quantized) waveform updates
+    INT16_WAVEFORM_SCALE = 1.0 / 32767.0
+
     # Colors (RGBA) - 90s Neon aesthetic
     COLORS = {
         # FM channels - neon/synthwave colors
@@ -49,9 +52,8 @@ class VisualizerApp:
     }
 
     def __init__(self):
-        # Waveform data for each channel
-        self.waveforms = [np.zeros(self.WAVEFORM_SAMPLES, dtype=np.float32)
-                          for _ in range(self.TOTAL_CHANNELS)]
+        # Waveform data for each channel (one row per channel)
+        self.waveforms = np.zeros((self.TOTAL_CHANNELS, self.WAVEFORM_SAMPLES), dtype=np.float32)
 
         # Channel labels
         self.channel_labels = [
@@ -179,7 +181,12 @@ class VisualizerApp:
                 # Roll existing data and append new
                 samples = min(len(data), self.WAVEFORM_SAMPLES)
                 self.waveforms[channel] = np.roll(self.waveforms[channel], -samples)
-                self.waveforms[channel][-samples:] = data[-samples:]
+                if data.dtype == np.int16:
+                    # Quantized waveform: convert back to [-1, 1] floats
+                    np.multiply(data[-samples:], self.INT16_WAVEFORM_SCALE,
+                                out=self.waveforms[channel][-samples:])
+                else:
+                    self.waveforms[channel][-samples:] = data[-samples:]
 
                 # Track valid data (caps at buffer size)
                 self.valid_samples[channel] = min(
@@ -190,6 +197,26 @@ class VisualizerApp:
                 # Accumulate samples for frame-to-frame continuity
                 self.samples_since_last_frame[channel] += samples
 
+    def update_waveforms(self, data: np.ndarray):
+        """Update all channels at once from a (TOTAL_CHANNELS, n) block (thread-safe)."""
+        samples = min(data.shape[1], self.WAVEFORM_SAMPLES)
+        if samples == 0:
+            return
+        with self._lock:
+            # Shift every channel left in one operation and append the new samples
+            self.waveforms[:, :-samples] = self.waveforms[:, samples:]
+            if data.dtype == np.int16:
+                np.multiply(data[:, -samples:], self.INT16_WAVEFORM_SCALE,
+                            out=self.waveforms[:, -samples:])
+            else:
+                self.waveforms[:, -samples:] = data[:, -samples:]
+            for channel in range(self.TOTAL_CHANNELS):
+                self.valid_samples[channel] = min(
+                    self.valid_samples[channel] + samples,
+                    self.WAVEFORM_SAMPLES
+                )
+                self.samples_since_last_frame[channel] += samples
+
     def _estimate_period(self, channel_idx: int, data: np.ndarray) -> float:
         """
         Estimate waveform period using zero-crossing analysis.
@@ -720,12 +747,15 @@ class VisualizerApp:
         window_size = viewport.size
 
         # Calculate global amplitude from all channels
+        # (snapshot under the lock, compute outside it so waveform updates
+        # from the streaming thread aren't held up)
         total_amp = 0.0
         with self._lock:
-            for ch in range(self.TOTAL_CHANNELS):
-                if self.valid_samples[ch] > 100:
-                    chunk = self.waveforms[ch][-256:]
-                    total_amp += np.abs(chunk).mean()
+            recent = self.waveforms[:, -256:].copy()
+            valid_samples = list(self.valid_samples)
+        for ch in range(self.TOTAL_CHANNELS):
+            if valid_samples[ch] > 100:
+                total_amp += np.abs(recent[ch]).mean()
         avg_amp = total_amp / self.TOTAL_CHANNELS
 
         # Smooth the amplitude for pulse effect
@@ -892,6 +922,8 @@ def test_visualizer():
         freqs = [220 * (1 + ch * 0.3) for ch in range(app.TOTAL_CHANNELS)]
 
         elapsed = 0.0
+        frame_time = 0.016  # ~60fps
+        next_deadline = time.monotonic()
         while True:
             for ch in range(app.TOTAL_CHANNELS):
                 freq = freqs[ch]
@@ -917,7 +949,15 @@ def test_visualizer():
 
             elapsed += samples_per_update / sample_rate
             app.set_progress((elapsed * 10) % 100, elapsed)
-            time.sleep(0.016)  # ~60fps
+
+            # Pace to a deadline so generation time doesn't accumulate as drift;
+            # more than a frame behind restarts the cadence from now
+            next_deadline += frame_time
+            now = time.monotonic()
+            if now < next_deadline:
+                time.sleep(next_deadline - now)
+            elif now - next_deadline > frame_time:
+                next_deadline = now
 
     # Start test data generator
     test_thread = threading.Thread(target=generate_test_data, daemon=True)
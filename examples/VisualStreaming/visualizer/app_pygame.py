@@ -151,6 +151,7 @@ class VisualizerApp:
     PSG_CHANNELS = 4
     TOTAL_CHANNELS = FM_CHANNELS + PSG_CHANNELS
     WAVEFORM_SAMPLES = 8192
+    INT16_WAVEFORM_SCALE = 1.0 / 32767.0  # Scale for int16 (quantized) waveform updates
 
     # 90s Neon colors (RGBA floats) - brightened for CRT shader
     COLORS = {
@@ -176,9 +177,8 @@ class VisualizerApp:
         self.portrait_mode = portrait_mode
         self.recording_mode = recording_mode
 
-        # Waveform data
-        self.waveforms = [np.zeros(self.WAVEFORM_SAMPLES, dtype=np.float32)
-                          for _ in range(self.TOTAL_CHANNELS)]
+        # Waveform data (one row per channel)
+        self.waveforms = np.zeros((self.TOTAL_CHANNELS, self.WAVEFORM_SAMPLES), dtype=np.float32)
 
         self.channel_labels = [
             "FM 1", "FM 2", "FM 3", "FM 4", "FM 5", "FM 6",
@@ -269,7 +269,31 @@ class VisualizerApp:
             with self._lock:
                 samples = min(len(data), self.WAVEFORM_SAMPLES)
                 self.waveforms[channel] = np.roll(self.waveforms[channel], -samples)
-                self.waveforms[channel][-samples:] = data[-samples:]
+                if data.dtype == np.int16:
+                    np.multiply(data[-samples:], self.INT16_WAVEFORM_SCALE,
+                                out=self.waveforms[channel][-samples:])
+                else:
+                    self.waveforms[channel][-samples:] = data[-samples:]
+                self.valid_samples[channel] = min(
+                    self.valid_samples[channel] + samples,
+                    self.WAVEFORM_SAMPLES
+                )
+                self.samples_since_last_frame[channel] += samples
+
+    def update_waveforms(self, data: np.ndarray):
+        """Update all channels at once from a (TOTAL_CHANNELS, n) block (thread-safe)."""
+        samples = min(data.shape[1], self.WAVEFORM_SAMPLES)
+        if samples == 0:
+            return
+        with self._lock:
+            # Shift every channel left in one operation and append the new samples
+            self.waveforms[:, :-samples] = self.waveforms[:, samples:]
+            if data.dtype == np.int16:
+                np.multiply(data[:, -samples:], self.INT16_WAVEFORM_SCALE,
+                            out=self.waveforms[:, -samples:])
+            else:
+                self.waveforms[:, -samples:] = data[:, -samples:]
+            for channel in range(self.TOTAL_CHANNELS):
                 self.valid_samples[channel] = min(
                     self.valid_samples[channel] + samples,
                     self.WAVEFORM_SAMPLES
@@ -997,14 +1021,17 @@ class VisualizerApp:
 
         # Calculate global amplitude for pulse using envelope follower
         # Use RMS of loudest active channels for better musical response
+        # (snapshot under the lock, compute outside it so waveform updates
+        # from the streaming thread aren't held up)
         max_rms = 0.0
         with self._lock:
-            for ch in range(self.TOTAL_CHANNELS):
-                if self.valid_samples[ch] > 100 and self.key_on[ch]:
-                    chunk = self.waveforms[ch][-512:]
-                    # RMS is smoother than peak
-                    rms = np.sqrt(np.mean(chunk ** 2))
-                    max_rms = max(max_rms, rms)
+            recent = self.waveforms[:, -512:].copy()
+            valid_samples = list(self.valid_samples)
+        for ch in range(self.TOTAL_CHANNELS):
+            if valid_samples[ch] > 100 and self.key_on[ch]:
+                # RMS is smoother than peak
+                rms = np.sqrt(np.mean(recent[ch] ** 2))
+                max_rms = max(max_rms, rms)
 
         # Target pulse based on loudest channel
         target_pulse = min(1.0, max_rms * 4.0)
@@ -1617,6 +1644,8 @@ def test_visualizer():
         freqs = [220 * (1 + ch * 0.5) for ch in range(app.TOTAL_CHANNELS)]
 
         frame = 0
+        frame_time = 0.008  # ~120fps data generation
+        next_deadline = time.monotonic()
         while app.running:
             for ch in range(app.TOTAL_CHANNELS):
                 freq = freqs[ch]
@@ -1643,7 +1672,12 @@ def test_visualizer():
                 app.set_channel_pitch(ch, midi_note)
 
             frame += 1
-            time.sleep(0.008)  # ~120fps data generation
+            next_deadline += frame_time
+            now = time.monotonic()
+            if now < next_deadline:
+                time.sleep(next_deadline - now)
+            elif now - next_deadline > frame_time:
+                next_deadline = now
 
     # Set running before thread starts
     app.running = True